@@ -0,0 +1,231 @@
+import operator
+import re
+
+# Decimal numbers as written by the calculator ("12", "0.5", "3.", "1e-05")
+# and the four operators it can append; only ASCII digits and the whitespace
+# Python accepts inside an expression, so anything else is left to asteval
+TOKEN_PATTERN = re.compile(r"[ \t\f]*(?:(?P<number>(?:[0-9]+\.?[0-9]*|\.[0-9]+)(?:[eE][+-]?[0-9]+)?)|(?P<operator>[-+*/]))")
+
+# Operators allowed in front of an operand (e.g. "-3+2")
+UNARY_OPERATORS = {
+    "+": operator.pos,
+    "-": operator.neg,
+}
+
+# Binary operators with their precedence (higher binds tighter)
+BINARY_OPERATORS = {
+    "+": (1, operator.add),
+    "-": (1, operator.sub),
+    "*": (2, operator.mul),
+    "/": (2, operator.truediv),
+}
+
+
+class ArithmeticSyntaxError(ValueError):
+    """
+    Raised when an expression is outside the four-operator grammar
+    handled by this module.
+    """
+
+
+def tokenize(expression):
+    """
+    Splits the expression into a list of (kind, text) tokens.
+    Raises ArithmeticSyntaxError on any character outside the grammar.
+    """
+    tokens = []
+    position = 0
+    end = len(expression.rstrip(" \t\f"))
+    while position < end:
+        match = TOKEN_PATTERN.match(expression, position)
+        if match is None:
+            raise ArithmeticSyntaxError(f"Unexpected character at position {position}")
+        kind = match.lastgroup
+        tokens.append((kind, match.group(kind)))
+        position = match.end()
+    return tokens
+
+
+def to_number(text):
+    """
+    Converts a number token to int or float the same way a Python literal would.
+    """
+    if "." in text or "e" in text or "E" in text:
+        return float(text)
+    if len(text) > 1 and text[0] == "0":
+        # Python rejects "08", only "0", "00"... are valid
+        if text.strip("0"):
+            raise ArithmeticSyntaxError(f"Leading zeros are not allowed: {text}")
+    return int(text)
+
+
+def parse(expression):
+    """
+    Parses the expression with precedence climbing and returns it
+    as a tuple in postfix order, ready for run().
+    Numbers are stored as values, operators as (arity, function) pairs.
+    """
+    tokens = tokenize(expression)
+    if not tokens:
+        raise ArithmeticSyntaxError("Empty expression")
+
+    program = []
+    position = parse_expression(tokens, 0, 1, program)
+    if position != len(tokens):
+        raise ArithmeticSyntaxError(f"Unexpected token: {tokens[position][1]}")
+    return tuple(program)
+
+
+def parse_operand(tokens, position, program):
+    """
+    Parses a number with optional unary operators in front of it.
+    Returns the position of the next token.
+    """
+    unary = []
+    while position < len(tokens) and tokens[position][0] == "operator":
+        symbol = tokens[position][1]
+        if symbol not in UNARY_OPERATORS:
+            raise ArithmeticSyntaxError(f"Unexpected operator: {symbol}")
+        unary.append(UNARY_OPERATORS[symbol])
+        position += 1
+
+    if position == len(tokens):
+        raise ArithmeticSyntaxError("Expression ends with an operator")
+
+    program.append(to_number(tokens[position][1]))
+    for function in reversed(unary):
+        program.append((1, function))
+    return position + 1
+
+
+def parse_expression(tokens, position, min_precedence, program):
+    """
+    Parses operands joined by binary operators whose precedence is at least min_precedence.
+    Returns the position of the next token.
+    """
+    position = parse_operand(tokens, position, program)
+    while position < len(tokens):
+        kind, symbol = tokens[position]
+        if kind != "operator":
+            raise ArithmeticSyntaxError(f"Unexpected number: {symbol}")
+        precedence, function = BINARY_OPERATORS[symbol]
+        if precedence < min_precedence:
+            break
+        # All operators are left-associative, so the right side only takes tighter ones
+        position = parse_expression(tokens, position + 1, precedence + 1, program)
+        program.append((2, function))
+    return position
+
+
+def run(program):
+    """
+    Calculates the result of a program returned by parse().
+    Arithmetic errors (e.g. division by zero) are raised as they are in Python.
+    """
+    stack = []
+    push = stack.append
+    pop = stack.pop
+    for item in program:
+        if type(item) is tuple:
+            arity, function = item
+            if arity == 1:
+                push(function(pop()))
+            else:
+                right = pop()
+                push(function(pop(), right))
+        else:
+            push(item)
+    return stack[0]
+
+
+def evaluate(expression):
+    """
+    Parses and calculates the expression in one call.
+    """
+    return run(parse(expression))
+
+
+class RunningTotal:
+    """
+    The RunningTotal class keeps the partial result of an expression
+    while it is being typed, so the result can be previewed after every key.
+    The expression value is sum + term, where term is the current
+    multiplicative term; the operator typed last is kept pending
+    until the next number is committed, so replacing it costs nothing.
+    Every operation is O(1) in the number of terms.
+    """
+
+    def __init__(self, number=to_number):
+        """
+        Starts with an empty expression.
+        number converts a number token to a value (to_number, or exact.to_fraction).
+        """
+        self.number = number
+        self.reset()
+
+    def reset(self):
+        """
+        Forgets all committed numbers and operators.
+        """
+        self.sum = None
+        self.term = None
+        self.pending = None
+        self.valid = True
+
+    def to_operand(self, text):
+        """
+        Converts a number typed on the calculator, possibly negative
+        (e.g. a previous result), the same way the evaluator would.
+        """
+        if text.startswith("-"):
+            return -self.number(text[1:])
+        return self.number(text)
+
+    def combine(self, number):
+        """
+        Returns the (sum, term) pair after applying the pending operator to number.
+        """
+        if self.pending is None:
+            return self.sum, number
+        if self.pending == "*":
+            return self.sum, self.term * number
+        if self.pending == "/":
+            return self.sum, self.term / number
+        total = self.term if self.sum is None else self.sum + self.term
+        return total, (number if self.pending == "+" else -number)
+
+    def push(self, text, operator, value=None):
+        """
+        Commits a typed number followed by an operator.
+        value is the number's exact value when it is known (e.g. a calculated result).
+        """
+        if not self.valid:
+            return
+        try:
+            self.sum, self.term = self.combine(self.to_operand(text) if value is None else value)
+        except (ValueError, ArithmeticError):
+            self.valid = False
+            return
+        self.pending = operator
+
+    def replace_operator(self, operator):
+        """
+        Replaces the pending operator (e.g. "5+" becomes "5*").
+        """
+        self.pending = operator
+
+    def value(self, text="", value=None):
+        """
+        Returns the value of the committed expression followed by the number
+        currently being typed (if any), whose exact value can be given as value.
+        Raises ValueError if the expression has no value.
+        """
+        if not self.valid:
+            raise ValueError("Invalid expression")
+        if value is not None or text:
+            total, term = self.combine(self.to_operand(text) if value is None else value)
+        elif self.term is None:
+            raise ValueError("Incomplete expression")
+        else:
+            total, term = self.sum, self.term
+        return term if total is None else total + term
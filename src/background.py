@@ -0,0 +1,109 @@
+import multiprocessing
+import time
+from multiprocessing.pool import ThreadPool
+
+# Default time budget of one computation, in seconds
+DEFAULT_TIMEOUT = 5.0
+
+# Default size budget: longest input (in characters) accepted for a computation
+DEFAULT_MAX_INPUT_LENGTH = 100000
+
+# How often the UI thread checks for a finished computation, in milliseconds
+POLL_INTERVAL_MS = 5
+
+
+class BackgroundEvaluator:
+    """
+    The BackgroundEvaluator class runs the calculator's computations
+    in a worker, so the Tk main loop never waits for them.
+    Results are posted back to the UI thread through window.after.
+    A computation that exceeds its time or size budget, or that is
+    cancelled, reports no result (None), like an invalid expression.
+    """
+
+    def __init__(self, window, timeout=DEFAULT_TIMEOUT, max_input_length=DEFAULT_MAX_INPUT_LENGTH, in_process=False):
+        """
+        Creates the worker for the given Tk window and budgets.
+        in_process runs the computations in a worker process instead of a thread:
+        big integer and Fraction arithmetic holds the GIL for its whole duration,
+        and a process can be stopped when the computation is cancelled.
+        The function and argument of each computation must then be picklable.
+        """
+        self.window = window
+        self.timeout = timeout
+        self.max_input_length = max_input_length
+        # Daemonic processes (e.g. the workers of replay.py) cannot start children
+        self.in_process = in_process and not multiprocessing.current_process().daemon
+        # The pool is started on the first computation
+        self.pool = None
+        self.result = None
+        # Increased on every submit and cancel; results of older generations are dropped
+        self.generation = 0
+
+    @property
+    def busy(self):
+        """
+        Checks if a computation is pending.
+        """
+        return self.result is not None
+
+    def submit(self, function, argument, on_done):
+        """
+        Runs function(argument) in the worker and calls on_done(result)
+        on the UI thread. on_done receives None if the computation failed,
+        timed out or its argument exceeds the size budget.
+        """
+        if len(argument) > self.max_input_length:
+            on_done(None)
+            return
+
+        if self.pool is None:
+            self.pool = multiprocessing.Pool(1) if self.in_process else ThreadPool(1)
+        self.generation += 1
+        self.result = self.pool.apply_async(function, (argument,))
+        deadline = time.monotonic() + self.timeout
+        self.window.after(POLL_INTERVAL_MS, self.poll, self.generation, deadline, on_done)
+
+    def poll(self, generation, deadline, on_done):
+        """
+        Checks the pending computation from the UI thread and reports it when done.
+        """
+        if generation != self.generation:
+            return
+
+        result = self.result
+        if result.ready():
+            self.result = None
+            on_done(result.get() if result.successful() else None)
+        elif time.monotonic() > deadline:
+            self.cancel()
+            on_done(None)
+        else:
+            self.window.after(POLL_INTERVAL_MS, self.poll, generation, deadline, on_done)
+
+    def cancel(self):
+        """
+        Drops the pending computation, if any.
+        A running computation is stopped with its worker process; a worker
+        thread cannot be interrupted, so it is left to finish on its own.
+        Later computations get a fresh worker.
+        """
+        if self.result is None:
+            return
+        self.generation += 1
+        if not self.result.ready():
+            if self.in_process:
+                self.pool.terminate()
+            else:
+                self.pool.close()
+            self.pool = None
+        self.result = None
+
+    def shutdown(self):
+        """
+        Cancels the pending computation and stops the worker.
+        """
+        self.cancel()
+        if self.pool is not None:
+            self.pool.terminate()
+            self.pool = None
@@ -0,0 +1,125 @@
+"""
+Batch mode for the calculator: evaluates expressions line by line
+from a file or stdin and writes one result per line, in input order.
+
+Usage:
+    python src/batch.py [INPUT] [--output OUTPUT] [--processes N] [--chunk-size N]
+"""
+import argparse
+import multiprocessing
+import sys
+import time
+from collections import deque
+from evaluator import Evaluator
+
+# Number of lines sent to a worker at once
+DEFAULT_CHUNK_SIZE = 10000
+
+# Number of chunks waiting per worker before reading more input
+CHUNKS_IN_FLIGHT_PER_PROCESS = 2
+
+# Evaluator of the current worker process, created by init_worker
+worker_evaluator = None
+
+
+def init_worker():
+    """
+    Creates the evaluator once per worker process.
+    """
+    global worker_evaluator
+    worker_evaluator = Evaluator()
+
+
+def evaluate_chunk(lines):
+    """
+    Evaluates a chunk of expressions and returns their results as output lines.
+    """
+    calculate = worker_evaluator.calculate
+    return "".join(calculate(line) + "\n" for line in lines)
+
+
+def read_expressions(stream):
+    """
+    Yields the expressions of a text stream one line at a time,
+    without the line endings.
+    """
+    for line in stream:
+        yield line.rstrip("\r\n")
+
+
+def read_chunks(expressions, chunk_size):
+    """
+    Groups the expressions into lists of at most chunk_size lines.
+    """
+    chunk = []
+    for expression in expressions:
+        chunk.append(expression)
+        if len(chunk) == chunk_size:
+            yield chunk
+            chunk = []
+    if chunk:
+        yield chunk
+
+
+def run_batch(input_stream, output_stream, processes=None, chunk_size=DEFAULT_CHUNK_SIZE):
+    """
+    Evaluates every line of input_stream across a process pool and writes
+    the results to output_stream in input order.
+    Only a bounded number of chunks is held in memory at any time.
+    Returns the number of evaluated lines.
+    """
+    processes = processes or multiprocessing.cpu_count()
+    max_in_flight = processes * CHUNKS_IN_FLIGHT_PER_PROCESS
+    line_count = 0
+
+    with multiprocessing.Pool(processes, initializer=init_worker) as pool:
+        pending = deque()
+        for chunk in read_chunks(read_expressions(input_stream), chunk_size):
+            line_count += len(chunk)
+            pending.append(pool.apply_async(evaluate_chunk, (chunk,)))
+            # Wait for the oldest chunk before reading further, so memory stays flat
+            if len(pending) >= max_in_flight:
+                output_stream.write(pending.popleft().get())
+        while pending:
+            output_stream.write(pending.popleft().get())
+
+    output_stream.flush()
+    return line_count
+
+
+def parse_args(argv=None):
+    """
+    Parses the command-line arguments of the batch mode.
+    """
+    parser = argparse.ArgumentParser(description="Evaluate calculator expressions line by line.")
+    parser.add_argument("input", nargs="?", default="-", help="file with one expression per line (default: stdin)")
+    parser.add_argument("-o", "--output", default="-", help="file to write the results to (default: stdout)")
+    parser.add_argument("-p", "--processes", type=int, default=None, help="number of worker processes (default: CPU count)")
+    parser.add_argument("-c", "--chunk-size", type=int, default=DEFAULT_CHUNK_SIZE, help="lines per chunk sent to a worker")
+    return parser.parse_args(argv)
+
+
+def main(argv=None):
+    """
+    Runs the batch mode and reports the throughput on stderr.
+    """
+    args = parse_args(argv)
+    input_stream = sys.stdin if args.input == "-" else open(args.input, encoding="utf-8")
+    output_stream = sys.stdout if args.output == "-" else open(args.output, "w", encoding="utf-8")
+
+    try:
+        start = time.perf_counter()
+        line_count = run_batch(input_stream, output_stream, args.processes, args.chunk_size)
+        elapsed = time.perf_counter() - start
+    finally:
+        if input_stream is not sys.stdin:
+            input_stream.close()
+        if output_stream is not sys.stdout:
+            output_stream.close()
+
+    rate = line_count / elapsed if elapsed > 0 else 0.0
+    print(f"{line_count} lines in {elapsed:.3f} s ({rate:,.0f} lines/sec)", file=sys.stderr)
+
+
+if __name__ == "__main__":
+    main()
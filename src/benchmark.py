@@ -0,0 +1,411 @@
+"""
+Benchmark suite for the calculator window: measures the latency of every
+handler (add_to_expression, append_operator, clear_entry, square, sqrt,
+evaluate), the construction time of Calculator and the memory growth over
+a long typing session, without a display.
+customtkinter is replaced by a lightweight stand-in whose window runs
+scheduled callbacks (after, after_idle) on demand, so a handler's latency
+includes the label render and, for background operations, the computation.
+Results are written as JSON and can be compared to a stored baseline;
+the run fails if a metric regressed beyond the threshold.
+
+Usage:
+    python src/benchmark.py [--output RESULTS.json] [--baseline BASELINE.json] [--save-baseline]
+"""
+import argparse
+import gc
+import json
+import platform
+import random
+import sys
+import time
+import tracemalloc
+import types
+from collections import deque
+
+# Timed calls of each handler
+DEFAULT_ITERATIONS = 2000
+
+# Calculator windows built to time the construction
+DEFAULT_CONSTRUCTIONS = 50
+
+# Keys pressed in the session measuring memory growth
+DEFAULT_SESSION_KEYS = 20000
+
+# Allowed slowdown against the baseline (0.25 means 25 % slower)
+DEFAULT_THRESHOLD = 0.25
+
+# Latency metrics compared against the baseline
+COMPARED_METRICS = ("p50_us", "p90_us")
+
+# Memory growth below this is never reported as a regression, in KiB
+MEMORY_SLACK_KB = 64
+
+# Keys of the random session, weighted like typical typing
+SESSION_KEYS = "0123456789" * 4 + "...++--**//" + "=" * 3 + "\b\b" + "²√"
+
+
+class FakeWidget:
+    """
+    Stand-in for the customtkinter widgets: keeps the configured options
+    and accepts the layout calls without drawing anything.
+    """
+
+    def __init__(self, master=None, **options):
+        """
+        Creates the widget with its options.
+        """
+        self.master = master
+        self.options = options
+
+    def configure(self, **options):
+        """
+        Updates the widget options, counting label redraws on the window.
+        """
+        self.options.update(options)
+        window = self.master
+        while window is not None and not isinstance(window, FakeWindow):
+            window = window.master
+        if window is not None:
+            window.redraws += 1
+
+    def cget(self, name):
+        """
+        Returns a widget option.
+        """
+        return self.options[name]
+
+    def ignore(self, *args, **options):
+        """
+        Accepts a call that has no effect without a display.
+        """
+
+    pack = grid = place = place_forget = rowconfigure = columnconfigure = ignore
+
+
+class FakeWindow(FakeWidget):
+    """
+    Stand-in for customtkinter.CTk: keeps the key bindings and runs
+    the callbacks scheduled with after() and after_idle() in run_pending(),
+    without waiting for their delay.
+    Before a delayed callback runs, the GIL is released so a worker thread
+    can make progress, as it would while Tk waits for the delay.
+    """
+
+    def __init__(self, **options):
+        """
+        Creates the window with an empty event queue.
+        """
+        super().__init__(None, **options)
+        self.bindings = {}
+        self.pending = deque()
+        self.redraws = 0
+        self.clipboard = ""
+
+    geometry = resizable = title = iconbitmap = FakeWidget.ignore
+
+    def bind(self, sequence, function):
+        """
+        Records the handler of a key sequence.
+        """
+        self.bindings[sequence] = function
+
+    def after(self, delay, function, *args):
+        """
+        Schedules a callback; the delay is not waited for.
+        """
+        self.pending.append((function, args, True))
+
+    def after_idle(self, function, *args):
+        """
+        Schedules a callback for when the window is idle.
+        """
+        self.pending.append((function, args, False))
+
+    def clipboard_get(self):
+        """
+        Returns the fake clipboard text.
+        """
+        return self.clipboard
+
+    def run_pending(self):
+        """
+        Runs the scheduled callbacks, including the ones they schedule, until none is left.
+        """
+        pending = self.pending
+        while pending:
+            function, args, delayed = pending.popleft()
+            if delayed:
+                time.sleep(0)
+            function(*args)
+
+    def update(self):
+        """
+        Runs the scheduled callbacks, like a Tk update.
+        """
+        self.run_pending()
+
+    def mainloop(self):
+        """
+        Runs the scheduled callbacks and returns.
+        """
+        self.run_pending()
+
+
+def install_fake_customtkinter():
+    """
+    Registers the stand-in as the customtkinter module and returns it.
+    Must be called before main is imported.
+    """
+    module = types.ModuleType("customtkinter")
+    module.CTk = FakeWindow
+    module.CTkFrame = FakeWidget
+    module.CTkLabel = FakeWidget
+    module.CTkButton = FakeWidget
+    sys.modules["customtkinter"] = module
+    return module
+
+
+def percentiles(samples):
+    """
+    Returns the latency statistics of a list of durations in seconds, in microseconds.
+    """
+    samples = sorted(samples)
+    count = len(samples)
+
+    def percentile(fraction):
+        return samples[min(int(fraction * count), count - 1)] * 1e6
+
+    return {
+        "count": count,
+        "mean_us": sum(samples) / count * 1e6,
+        "p50_us": percentile(0.50),
+        "p90_us": percentile(0.90),
+        "p99_us": percentile(0.99),
+        "max_us": samples[-1] * 1e6,
+    }
+
+
+def type_keys(calculator, keys):
+    """
+    Types keys through the window bindings and runs the scheduled callbacks.
+    """
+    bindings = calculator.window.bindings
+    for key in keys:
+        bindings[key](None)
+    calculator.window.run_pending()
+
+
+def time_handler(calculator, prepare, call, iterations):
+    """
+    Times call(calculator) until its result is on the labels, after prepare(calculator)
+    sets up the state untimed. Returns the list of durations in seconds.
+    """
+    window = calculator.window
+    clock = time.perf_counter
+    samples = []
+    for _ in range(iterations):
+        prepare(calculator)
+        window.run_pending()
+        start = clock()
+        call(calculator)
+        window.run_pending()
+        samples.append(clock() - start)
+    return samples
+
+
+def prepare_digits(calculator):
+    """
+    Starts a new number every 12 digits so the typed number stays realistic.
+    """
+    if len(calculator.engine.current) >= 12:
+        calculator.clear()
+
+
+def prepare_expression(keys):
+    """
+    Returns a prepare function that clears the calculator and types keys.
+    """
+    def prepare(calculator):
+        calculator.clear()
+        type_keys(calculator, keys)
+    return prepare
+
+
+# Timed handlers: name, untimed preparation, timed call
+HANDLERS = (
+    ("add_to_expression", prepare_digits, lambda calculator: calculator.add_to_expression(7)),
+    ("append_operator", prepare_expression("12"), lambda calculator: calculator.append_operator("+")),
+    ("clear_entry", prepare_expression("123"), lambda calculator: calculator.clear_entry()),
+    ("square", prepare_expression("12.5"), lambda calculator: calculator.square()),
+    ("sqrt", prepare_expression("144"), lambda calculator: calculator.sqrt()),
+    ("evaluate", prepare_expression("12+3*4-5/2"), lambda calculator: calculator.evaluate()),
+)
+
+
+def benchmark_handlers(main, iterations, exact_mode):
+    """
+    Returns the latency statistics of every handler.
+    """
+    calculator = main.Calculator(exact_mode=exact_mode)
+    results = {}
+    try:
+        for name, prepare, call in HANDLERS:
+            # A few untimed calls warm up the caches
+            time_handler(calculator, prepare, call, min(iterations, 50))
+            results[name] = percentiles(time_handler(calculator, prepare, call, iterations))
+    finally:
+        calculator.background.shutdown()
+    return results
+
+
+def benchmark_construction(main, constructions, exact_mode):
+    """
+    Returns the statistics of the Calculator construction time.
+    """
+    samples = []
+    for _ in range(constructions):
+        start = time.perf_counter()
+        calculator = main.Calculator(exact_mode=exact_mode)
+        samples.append(time.perf_counter() - start)
+        calculator.background.shutdown()
+    return percentiles(samples)
+
+
+def benchmark_session(main, keys, exact_mode, seed=0):
+    """
+    Types a long random session and returns the memory growth
+    and the number of label redraws per key.
+    """
+    calculator = main.Calculator(exact_mode=exact_mode)
+    session = random.Random(seed).choices(SESSION_KEYS, k=keys)
+    key_names = {"=": "<Return>", "\b": "<BackSpace>"}
+    bindings = calculator.window.bindings
+    actions = {"²": calculator.square, "√": calculator.sqrt}
+    try:
+        # Load the lazily imported interpreter and warm up the caches before measuring
+        calculator.engine.evaluator.interpreter
+        type_keys(calculator, [key_names.get(key, key) for key in session[:1000] if key not in actions])
+        gc.collect()
+        tracemalloc.start()
+        start_memory = tracemalloc.get_traced_memory()[0]
+        calculator.window.redraws = 0
+        start = time.perf_counter()
+        for key in session:
+            if key in actions:
+                actions[key]()
+            else:
+                bindings[key_names.get(key, key)](None)
+            calculator.window.run_pending()
+        elapsed = time.perf_counter() - start
+        gc.collect()
+        current_memory, peak_memory = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+    finally:
+        calculator.background.shutdown()
+
+    return {
+        "keys": keys,
+        "keys_per_second": keys / elapsed if elapsed > 0 else 0.0,
+        "redraws_per_key": calculator.window.redraws / keys,
+        "growth_kb": (current_memory - start_memory) / 1024,
+        "peak_kb": (peak_memory - start_memory) / 1024,
+    }
+
+
+def run_benchmarks(iterations=DEFAULT_ITERATIONS, constructions=DEFAULT_CONSTRUCTIONS,
+                   session_keys=DEFAULT_SESSION_KEYS, exact_mode=False):
+    """
+    Runs the whole suite and returns the results as a JSON-serializable dict.
+    """
+    install_fake_customtkinter()
+    import main
+
+    return {
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "exact_mode": exact_mode,
+        "handlers": benchmark_handlers(main, iterations, exact_mode),
+        "construction": benchmark_construction(main, constructions, exact_mode),
+        "session": benchmark_session(main, session_keys, exact_mode),
+    }
+
+
+def compare(results, baseline, threshold=DEFAULT_THRESHOLD):
+    """
+    Returns a list of regression messages: latencies more than threshold slower
+    than the baseline, and memory growth above it (beyond MEMORY_SLACK_KB).
+    """
+    regressions = []
+    timed = dict(results["handlers"], __init__=results["construction"])
+    timed_baseline = dict(baseline.get("handlers", {}), __init__=baseline.get("construction", {}))
+    for name, stats in timed.items():
+        for metric in COMPARED_METRICS:
+            reference = timed_baseline.get(name, {}).get(metric)
+            if reference and stats[metric] > reference * (1 + threshold):
+                regressions.append(f"{name} {metric}: {stats[metric]:.1f} us (baseline {reference:.1f} us)")
+
+    growth = results["session"]["growth_kb"]
+    reference = baseline.get("session", {}).get("growth_kb")
+    if reference is not None and growth > max(reference, 0) * (1 + threshold) + MEMORY_SLACK_KB:
+        regressions.append(f"memory growth: {growth:.1f} KiB (baseline {reference:.1f} KiB)")
+    return regressions
+
+
+def print_report(results, output=sys.stdout):
+    """
+    Prints the results as a table.
+    """
+    print(f"{'handler':<20}{'p50 us':>10}{'p90 us':>10}{'p99 us':>10}{'max us':>10}", file=output)
+    timed = dict(results["handlers"], __init__=results["construction"])
+    for name, stats in timed.items():
+        print(f"{name:<20}{stats['p50_us']:>10.1f}{stats['p90_us']:>10.1f}{stats['p99_us']:>10.1f}{stats['max_us']:>10.1f}", file=output)
+    session = results["session"]
+    print(f"session: {session['keys']} keys, {session['keys_per_second']:,.0f} keys/sec, "
+          f"{session['redraws_per_key']:.2f} redraws/key, memory growth {session['growth_kb']:.1f} KiB "
+          f"(peak {session['peak_kb']:.1f} KiB)", file=output)
+
+
+def parse_args(argv=None):
+    """
+    Parses the command-line arguments of the benchmark suite.
+    """
+    parser = argparse.ArgumentParser(description="Benchmark the calculator handlers without a display.")
+    parser.add_argument("-o", "--output", help="file to write the results to, as JSON")
+    parser.add_argument("-b", "--baseline", help="JSON results to compare against")
+    parser.add_argument("--save-baseline", action="store_true", help="write the results to the baseline file instead of comparing")
+    parser.add_argument("-t", "--threshold", type=float, default=DEFAULT_THRESHOLD, help="allowed slowdown, e.g. 0.25 for 25%%")
+    parser.add_argument("-n", "--iterations", type=int, default=DEFAULT_ITERATIONS, help="timed calls of each handler")
+    parser.add_argument("--constructions", type=int, default=DEFAULT_CONSTRUCTIONS, help="windows built to time the construction")
+    parser.add_argument("--session-keys", type=int, default=DEFAULT_SESSION_KEYS, help="keys typed to measure memory growth")
+    parser.add_argument("--exact", action="store_true", help="benchmark the exact arithmetic mode")
+    return parser.parse_args(argv)
+
+
+def main(argv=None):
+    """
+    Runs the benchmark suite; returns 1 if a regression was found, 0 otherwise.
+    """
+    args = parse_args(argv)
+    results = run_benchmarks(args.iterations, args.constructions, args.session_keys, args.exact)
+    print_report(results)
+
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as file:
+            json.dump(results, file, indent=2)
+
+    if args.baseline and args.save_baseline:
+        with open(args.baseline, "w", encoding="utf-8") as file:
+            json.dump(results, file, indent=2)
+    elif args.baseline:
+        with open(args.baseline, encoding="utf-8") as file:
+            regressions = compare(results, json.load(file), args.threshold)
+        for regression in regressions:
+            print(f"REGRESSION {regression}", file=sys.stderr)
+        if regressions:
+            return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
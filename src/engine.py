@@ -0,0 +1,436 @@
+import random
+import re
+from copy import copy
+from functools import partial
+import exact
+from arithmetic import RunningTotal, to_number
+from evaluator import Evaluator, ERROR_MESSAGE
+from expression import NumberBuffer, TokenBuffer
+
+# Operators that can be appended to the total expression
+OPERATORS = ("/", "*", "+", "-")
+
+# A pasted expression may only contain digits, decimal points, operators
+# (also as the button symbols × and ÷) and whitespace, which is ignored
+PASTE_PATTERN = re.compile(r"[0-9.+\-*/\u00D7\u00F7\s]*")
+PASTE_TOKEN_PATTERN = re.compile(r"(?P<number>[0-9.]+)|(?P<operator>[-+*/])")
+PASTE_SYMBOLS = str.maketrans({"\u00D7": "*", "\u00F7": "/"})
+
+# Emoticons displayed at the start of the application
+EMOTIONS = (
+    "(¬‿¬)",
+    ":>",
+    "(≧◡≦)",
+    "(^_^)",
+    "(｡♥‿♥｡)",
+    "(≧ω≦)",
+    "(≧∇≦)/",
+    ":3",
+    "(˘︶˘).｡.:*♡",
+    "(✧ω✧)",
+    "(,,>﹏<,,)",
+    "(˶ᵔ ᵕ ᵔ˶)",
+)
+
+# States of the current expression
+EMOTION = "emotion"
+ERROR = "error"
+NUMBER = "number"
+
+
+class CalculatorEngine:
+    """
+    The CalculatorEngine class holds the calculator's state machine
+    without any user interface: the current and total expressions,
+    the emoticon start state, the error state and all operations.
+    The graphical Calculator is a view over it, and it can be driven
+    headlessly through press() and feed().
+    Expressions are kept in token buffers and rendered to strings only
+    when current_expression, total_expression or total_display are read.
+    In exact mode all operations use Fraction values (see the exact module)
+    and results keep their exact value next to their display text.
+    """
+
+    ERROR_MESSAGE = ERROR_MESSAGE
+
+    def __init__(self, evaluator=None, exact_mode=False):
+        """
+        Initializes the engine with a random emotion as the current expression.
+        An evaluator can be shared between several engines.
+        exact_mode switches from float to exact (Fraction) arithmetic.
+        """
+        self.evaluator = evaluator if evaluator is not None else Evaluator()
+        self.exact_mode = exact_mode
+
+        # Initialize with a random emotion to display at the start
+        self.emotion = self.get_random_emotion()
+        self.state = EMOTION
+
+        # Number being typed and the expression committed so far
+        self.current = NumberBuffer()
+        self.total = TokenBuffer()
+
+        # Expression shown above the current one; it keeps the evaluated
+        # expression after "=" until the next operator or clear
+        self.shown_total = self.total
+
+        # Partial result of total_expression, updated in O(1) for the live preview
+        self.running_total = RunningTotal(exact.to_fraction if exact_mode else to_number)
+
+        # Keys accepted by press() in addition to digits, "." and operators.
+        # Named keys match the button texts, single characters match the keyboard.
+        self.actions = {
+            "=": self.evaluate,
+            "\r": self.evaluate,
+            "C": self.clear,
+            "\x1b": self.clear,
+            "CE": self.clear_entry,
+            "\b": self.clear_entry,
+            "x²": self.square,
+            "²": self.square,
+            "√x": self.sqrt,
+            "√": self.sqrt,
+        }
+
+    def get_random_emotion(self):
+        """
+        Returns a random emoticon to display at the start of the application.
+        """
+        return random.choice(EMOTIONS)
+
+    @property
+    def current_expression(self):
+        """
+        Returns the text of the current expression: the number being typed,
+        the start emotion or the error message.
+        """
+        if self.state == NUMBER:
+            return self.current.render()
+        return self.emotion if self.state == EMOTION else self.ERROR_MESSAGE
+
+    @property
+    def total_expression(self):
+        """
+        Returns the text of the expression committed so far.
+        """
+        return self.total.render()
+
+    @property
+    def total_display(self):
+        """
+        Returns the text shown above the current expression.
+        """
+        return self.shown_total.render()
+
+    @property
+    def display(self):
+        """
+        Returns the display state as a (total_display, current_expression) tuple.
+        """
+        return self.total_display, self.current_expression
+
+    @property
+    def preview(self):
+        """
+        Returns the running result of total_expression + current_expression,
+        formatted like an evaluated result, or "" when there is nothing to preview.
+        """
+        if not self.total or self.state != NUMBER:
+            return ""
+        try:
+            return exact.format_number(self.running_total.value(self.current.render(), self.current.value))
+        except (ValueError, ArithmeticError):
+            return ""
+
+    def is_valid_expression(self):
+        """
+        Checks if the current expression is valid (not an error message).
+        """
+        return self.state != ERROR
+
+    def press(self, key):
+        """
+        Applies a single key the same way as pressing its button:
+        - "0"-"9" and "." add to the expression
+        - "+", "-", "*", "/" append an operator
+        - "=", "C", "CE", "x²", "√x" (or "\\r", "\\x1b", "\\b", "²", "√") run the special operations
+        """
+        if key in OPERATORS:
+            self.append_operator(key)
+        elif key == ".":
+            self.add_to_expression(key)
+        elif key in self.actions:
+            self.actions[key]()
+        elif len(key) == 1 and key.isdigit():
+            self.add_to_expression(int(key))
+        else:
+            raise ValueError(f"Unknown key: {key!r}")
+
+    def feed(self, keys):
+        """
+        Applies a whole key sequence in one call and returns the display state.
+        A string is read one character per key, any other iterable one item per key.
+        """
+        press = self.press
+        for key in keys:
+            press(key)
+        return self.display
+
+    def paste(self, text):
+        """
+        Applies a whole pasted expression (e.g. "12.5×3-4") in one pass,
+        with the same result as typing it key by key.
+        Returns False and changes nothing if the text contains anything
+        other than digits, decimal points, operators and whitespace.
+        """
+        if not PASTE_PATTERN.fullmatch(text):
+            return False
+        for match in PASTE_TOKEN_PATTERN.finditer(text.translate(PASTE_SYMBOLS)):
+            if match.lastgroup == "operator":
+                self.append_operator(match.group())
+            else:
+                self.add_digits(match.group())
+        return True
+
+    def add_digits(self, text):
+        """
+        Adds a run of digits and decimal points to the current expression,
+        like add_to_expression() for each character.
+        Only the characters that depend on the current number (leading zeros
+        and decimal points) go through add_to_expression(), the rest is added in bulk.
+        """
+        for position, char in enumerate(text):
+            if char != "." and self.state == NUMBER and not self.current.is_empty_or_zero():
+                break
+            self.add_to_expression(char if char == "." else int(char))
+        else:
+            return
+
+        # The number is now non-zero, so digits are appended as they are
+        # and only the first decimal point can be accepted
+        digits, point, decimals = text[position:].partition(".")
+        self.current.extend(digits)
+        if point:
+            self.add_to_expression(".")
+            self.current.extend(decimals.replace(".", ""))
+
+    def add_to_expression(self, value):
+        """
+        Adds a value (digit or dot) to the current expression.
+        If the current expression is a mistake or contains an emotion, it is cleared.
+        Checks the correctness of adding a decimal point.
+        """
+        if self.state != NUMBER:
+            self.clear()
+
+        current = self.current
+        if current.is_empty_or_zero():
+            if value == "0":
+                return
+            elif value == ".":
+                current.set("0")
+            else:
+                current.set(str(value))
+                return
+
+        if value == ".":
+            if current.is_empty() or current.last() in OPERATORS:
+                current.set("0")
+            elif current.has_decimal_point:
+                return
+
+        current.append(str(value))
+
+    def append_operator(self, operator):
+        """
+        Appends an operator to the current expression.
+        If the current expression is a mistake or emotion, it is cleared.
+        """
+        if self.state != NUMBER:
+            self.clear()
+        if self.current.is_empty() and not self.total:
+            return
+        if self.current.is_empty() and self.total.ends_with(OPERATORS):
+            self.total.replace_operator(operator)
+            self.running_total.replace_operator(operator)
+        else:
+            text = self.current.render()
+            self.running_total.push(text, operator, self.current.value)
+            self.total.append_number(text, self.current.has_decimal_point)
+            self.total.append_operator(operator)
+            self.current.set("")
+
+        self.shown_total = self.total
+
+    def clear(self):
+        """
+        Clears the current expression and total expression.
+        Sets the starting value of "0" for the current expression.
+        """
+        self.state = NUMBER
+        self.current.set("0")
+        self.total.clear()
+        self.shown_total = self.total
+        self.running_total.reset()
+
+    def clear_entry(self):
+        """
+        Removes the last character from the current expression.
+        If empty, sets the value to "0".
+        """
+        if self.state == NUMBER and len(self.current) > 1:
+            self.current.pop()
+        else:
+            self.state = NUMBER
+            self.current.set("0")
+
+    def set_result(self, result):
+        """
+        Replaces the current expression with a calculated result:
+        its display text, or its exact value (formatted here in bounded time).
+        """
+        self.state = NUMBER
+        if isinstance(result, str):
+            self.current.set(result)
+        else:
+            self.current.set(exact.format_number(result), result)
+
+    def recall(self, result):
+        """
+        Replaces the current expression with a result recalled from the history
+        (its display text); a recalled error message shows the error state.
+        """
+        if result == self.ERROR_MESSAGE:
+            self.state = ERROR
+        else:
+            self.set_result(result)
+
+    def square_result(self, text):
+        """
+        Returns the square of the number in text as display text,
+        or None if text is not a number.
+        """
+        try:
+            value = float(text)
+            return str(round(value**2, 12))
+        except (ValueError, OverflowError):
+            return None
+
+    def sqrt_result(self, text):
+        """
+        Returns the square root of the number in text as display text,
+        or None if text is not a number or the number is negative.
+        """
+        try:
+            value = float(text)
+        except ValueError:
+            return None
+        if value < 0:
+            return None
+        return str(round(value**0.5, 12))
+
+    def evaluate_result(self, expression):
+        """
+        Returns the result of the expression as display text,
+        or None if the expression is invalid.
+        """
+        try:
+            return exact.format_number(self.evaluator.evaluate(expression))
+        except Exception:
+            return None
+
+    @staticmethod
+    def exact_result(name, running_total, value, text):
+        """
+        Returns the exact value of an operation in exact mode, or None if it is invalid.
+        running_total is a snapshot of the expression and value the exact value
+        of text when it is known, so this never touches the engine state.
+        """
+        try:
+            if name == "evaluate":
+                if not text:
+                    return None
+                return exact.check_size(running_total.value(text, value))
+            operand = running_total.to_operand(text) if value is None else value
+            return exact.square(operand) if name == "square" else exact.sqrt(operand)
+        except (ValueError, ArithmeticError):
+            return None
+
+    def start_operation(self, name):
+        """
+        Prepares the "evaluate", "square" or "sqrt" operation so that its result
+        can be computed outside the engine (e.g. in a worker thread).
+        Returns a (function, argument) pair; function(argument) computes the result
+        without touching the engine state, and finish_operation() applies it.
+        Returns None if the operation completed immediately.
+        """
+        if self.exact_mode:
+            # The value of the current number is stale once the display shows something else (e.g. an error)
+            value = self.current.value if self.state == NUMBER else None
+            function = partial(self.exact_result, name, copy(self.running_total), value)
+        elif name == "square":
+            function = self.square_result
+        elif name == "sqrt":
+            function = self.sqrt_result
+        else:
+            function = self.evaluate_result
+
+        if name != "evaluate":
+            return function, self.current_expression
+
+        if self.state == ERROR:
+            self.clear()
+            return None
+
+        text = self.current_expression
+        self.total.append_number(text, self.state == NUMBER and self.current.has_decimal_point)
+        self.shown_total = self.total
+        return function, (text if self.exact_mode else self.total.render())
+
+    def finish_operation(self, name, result):
+        """
+        Applies the result of an operation started with start_operation().
+        A result of None displays the error message.
+        """
+        if result is None:
+            self.state = ERROR
+            if name == "evaluate":
+                self.running_total.valid = False
+            return
+
+        self.set_result(result)
+        if name == "evaluate":
+            # The evaluated expression stays shown until the next operator or clear
+            self.total = TokenBuffer()
+            self.running_total.reset()
+
+    def run_operation(self, name):
+        """
+        Starts, computes and finishes an operation synchronously.
+        """
+        operation = self.start_operation(name)
+        if operation is not None:
+            function, argument = operation
+            self.finish_operation(name, function(argument))
+
+    def square(self):
+        """
+        Calculates the square of the current expression.
+        If the expression is incorrect, an error message is displayed.
+        """
+        self.run_operation("square")
+
+    def sqrt(self):
+        """
+        Calculates the square root of the current expression.
+        If the expression is incorrect or the number is negative, an error message is displayed.
+        """
+        self.run_operation("sqrt")
+
+    def evaluate(self):
+        """
+        Calculates the result of the total expression.
+        Uses the calculator's safe evaluator to evaluate the expression.
+        If the expression is invalid, displays an error message.
+        """
+        self.run_operation("evaluate")
@@ -0,0 +1,101 @@
+import math
+from functools import lru_cache
+import arithmetic
+from exact import format_number
+
+# Error message to display when there is an invalid operation
+ERROR_MESSAGE = "ERROR (￢_￢;)"
+
+# Number of distinct expressions whose parsed form is kept around
+EXPRESSION_CACHE_SIZE = 256
+
+
+class Evaluator:
+    """
+    The Evaluator class owns one long-lived asteval interpreter
+    used to calculate the calculator's expressions.
+    Expressions made only of numbers and + - * / go through the native
+    parser in the arithmetic module, anything else falls back to asteval.
+    Parsed expressions are kept in an LRU cache, so repeated
+    evaluations of the same expression skip parsing.
+    asteval is only imported the first time the fallback is needed.
+    """
+
+    def __init__(self, cache_size=EXPRESSION_CACHE_SIZE):
+        """
+        Creates the cache of parsed expressions.
+        """
+        self.asteval_interpreter = None
+        self.initial_symbols = None
+        self.compile = lru_cache(maxsize=cache_size)(self._compile)
+
+    @property
+    def interpreter(self):
+        """
+        Returns the asteval interpreter, creating it with a minimal symbol table
+        (no numpy, no math module) on first use.
+        inf and nan are added, as the calculator can show them as results.
+        """
+        if self.asteval_interpreter is None:
+            from asteval import Interpreter
+            interpreter = Interpreter(minimal=True, use_numpy=False)
+            interpreter.symtable.update(inf=math.inf, nan=math.nan)
+            self.initial_symbols = dict(interpreter.symtable)
+            self.asteval_interpreter = interpreter
+        return self.asteval_interpreter
+
+    @staticmethod
+    def normalize(expression):
+        """
+        Returns the expression in the form used as the cache key.
+        """
+        return expression.strip()
+
+    def _compile(self, expression):
+        """
+        Parses a normalized expression into a postfix program (fast path)
+        or into its asteval AST representation (fallback).
+        Raises an exception if the expression is not valid.
+        """
+        try:
+            return arithmetic.parse(expression)
+        except arithmetic.ArithmeticSyntaxError:
+            self.reset()
+            return self.interpreter.parse(expression)
+
+    def reset(self):
+        """
+        Resets the interpreter state left over from the previous evaluation,
+        including any name an expression assigned, so no evaluation sees another's state.
+        """
+        symtable = self.interpreter.symtable
+        symtable.clear()
+        symtable.update(self.initial_symbols)
+        self.interpreter.error = []
+        self.interpreter.error_msg = None
+        self.interpreter.retval = None
+
+    def evaluate(self, expression):
+        """
+        Calculates the result of the expression.
+        Raises an exception if the expression is invalid or the result is not a number.
+        """
+        program = self.compile(self.normalize(expression))
+        if type(program) is tuple:
+            result = arithmetic.run(program)
+        else:
+            self.reset()
+            result = self.interpreter.run(program, with_raise=True)
+        if not isinstance(result, (int, float)):
+            raise ValueError("Invalid result")
+        return result
+
+    def calculate(self, expression):
+        """
+        Returns the result of the expression as the calculator displays it:
+        rounded to 12 digits, or ERROR_MESSAGE if the expression is invalid.
+        """
+        try:
+            return format_number(self.evaluate(expression))
+        except Exception:
+            return ERROR_MESSAGE
@@ -0,0 +1,142 @@
+"""
+Exact arithmetic for the calculator: numbers are kept as Fraction,
+so "0.1+0.2" is exactly 0.3 and repeated "x²" only stops at
+numbers of about twenty thousand digits instead of overflowing.
+Display texts are built in bounded time: huge values are rendered
+as their leading digits and an exponent, without a full str().
+"""
+import math
+from decimal import Decimal, localcontext, MAX_EMAX, MIN_EMIN
+from fractions import Fraction
+from arithmetic import to_number
+
+# Decimal places shown for values that are not integers, like round(result, 12)
+DISPLAY_DECIMALS = 12
+
+# Significant digits shown for huge values (e.g. "1.23456789012e+1000000")
+SCIENTIFIC_DIGITS = 12
+
+# Values up to this many bits (about 1000 digits) are displayed in full
+MAX_PLAIN_BITS = 3322
+
+# Precision of square roots that are not exact, in digits
+SQRT_DIGITS = 50
+
+# Largest numerator or denominator kept, in bits (about 19 700 digits):
+# multiplying or dividing two fractions of this size takes about 13 ms,
+# within a frame, while twice the size already takes about 47 ms
+MAX_BITS = 1 << 16
+
+# Square roots of numbers up to this many bits are checked for being exact
+MAX_EXACT_SQRT_BITS = 4096
+
+
+def to_fraction(text):
+    """
+    Converts a number token to a Fraction, accepting the same texts
+    as a Python literal (e.g. "12", "0.5", "3.", "1e-05").
+    """
+    if "." in text or "e" in text or "E" in text:
+        return Fraction(text)
+    return Fraction(to_number(text))
+
+
+def check_size(value):
+    """
+    Raises OverflowError if the value is too large to keep exactly.
+    """
+    if value.numerator.bit_length() > MAX_BITS or value.denominator.bit_length() > MAX_BITS:
+        raise OverflowError("Number is too large")
+    return value
+
+
+def square(value):
+    """
+    Returns the exact square of the value.
+    Raises OverflowError before multiplying if the square would be too large.
+    """
+    if 2 * max(value.numerator.bit_length(), value.denominator.bit_length()) > MAX_BITS + 1:
+        raise OverflowError("Number is too large")
+    return check_size(value * value)
+
+
+def sqrt(value):
+    """
+    Returns the square root of the value: exact when the numerator and
+    denominator are (not too large) perfect squares, SQRT_DIGITS significant digits otherwise.
+    Raises ValueError for a negative value.
+    """
+    if value < 0:
+        raise ValueError("Square root of negative number is not possible")
+    if max(value.numerator.bit_length(), value.denominator.bit_length()) <= MAX_EXACT_SQRT_BITS:
+        numerator_root = math.isqrt(value.numerator)
+        denominator_root = math.isqrt(value.denominator)
+        if numerator_root * numerator_root == value.numerator and denominator_root * denominator_root == value.denominator:
+            return Fraction(numerator_root, denominator_root)
+    with localcontext() as context:
+        context.prec = SQRT_DIGITS
+        context.Emax = MAX_EMAX
+        context.Emin = MIN_EMIN
+        return Fraction(to_decimal(value, SQRT_DIGITS + 5).sqrt())
+
+
+def leading_decimal(number, bits):
+    """
+    Returns a Decimal approximation of a non-negative integer using only
+    its leading bits, so it never converts the whole integer.
+    """
+    shift = max(number.bit_length() - bits, 0)
+    return Decimal(number >> shift) * Decimal(2) ** shift
+
+
+def to_decimal(value, digits):
+    """
+    Returns a Decimal approximation of the value with about the given number
+    of significant digits, in time independent of the value's size.
+    """
+    bits = digits * 4 + 16
+    with localcontext() as context:
+        context.prec = digits + 5
+        context.Emax = MAX_EMAX
+        context.Emin = MIN_EMIN
+        result = leading_decimal(abs(value.numerator), bits) / leading_decimal(value.denominator, bits)
+        return -result if value < 0 else result
+
+
+def format_scientific(value, digits=SCIENTIFIC_DIGITS):
+    """
+    Returns the leading digits of the value and its exponent, e.g. "1.23456789012e+1000000".
+    """
+    text = f"{to_decimal(value, digits):.{digits - 1}e}"
+    mantissa, exponent = text.split("e")
+    if "." in mantissa:
+        mantissa = mantissa.rstrip("0").rstrip(".")
+    return f"{mantissa}e{exponent}"
+
+
+def format_number(value):
+    """
+    Returns the display text of a result in bounded time:
+    - floats as str(round(value, 12)), like the calculator always did
+    - integers in full up to about 1000 digits
+    - other values rounded to 12 decimal places
+    - huge values as leading digits and an exponent
+    """
+    if isinstance(value, float):
+        return str(round(value, DISPLAY_DECIMALS))
+
+    value = Fraction(value)
+    magnitude = value.numerator.bit_length() - value.denominator.bit_length()
+    if magnitude > MAX_PLAIN_BITS:
+        return format_scientific(value)
+
+    rounded = round(value, DISPLAY_DECIMALS)
+    if rounded.denominator == 1:
+        return str(rounded.numerator)
+
+    # The denominator of the rounded value divides 10**12, so the decimals are exact
+    scale = 10**DISPLAY_DECIMALS
+    scaled = abs(rounded.numerator) * (scale // rounded.denominator)
+    integer_part, decimals = divmod(scaled, scale)
+    sign = "-" if rounded < 0 else ""
+    return f"{sign}{integer_part}.{decimals:0{DISPLAY_DECIMALS}d}".rstrip("0")
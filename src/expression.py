@@ -0,0 +1,176 @@
+from collections import namedtuple
+
+# A committed token of the total expression: its text, whether it is an operator
+# and whether it contains a decimal point
+Token = namedtuple("Token", ("text", "is_operator", "has_decimal_point"))
+
+
+class NumberBuffer:
+    """
+    The NumberBuffer class holds the number currently being typed
+    as a list of characters, with an O(1) append and backspace
+    and a constant-time decimal point flag.
+    A calculated result can also keep its exact value next to its display text.
+    """
+
+    def __init__(self, text=""):
+        """
+        Creates the buffer with an initial text.
+        """
+        self.set(text)
+
+    def set(self, text, value=None):
+        """
+        Replaces the whole number (e.g. with a calculated result and its exact value).
+        """
+        self.value = value
+        self.chars = list(text)
+        # Position of the decimal point, None if there is none
+        index = text.find(".")
+        self.decimal_index = index if index >= 0 else None
+        self.rendered = text
+
+    def append(self, char):
+        """
+        Appends one character to the number.
+        """
+        if char == "." and self.decimal_index is None:
+            self.decimal_index = len(self.chars)
+        self.chars.append(char)
+        self.value = None
+        self.rendered = None
+
+    def extend(self, digits):
+        """
+        Appends a run of digits (without a decimal point) in one call.
+        """
+        if not digits:
+            return
+        self.chars.extend(digits)
+        self.value = None
+        self.rendered = None
+
+    def pop(self):
+        """
+        Removes the last character of the number.
+        """
+        self.chars.pop()
+        if self.decimal_index is not None and self.decimal_index >= len(self.chars):
+            self.decimal_index = None
+        self.value = None
+        self.rendered = None
+
+    @property
+    def has_decimal_point(self):
+        """
+        Checks if the number contains a decimal point.
+        """
+        return self.decimal_index is not None
+
+    def is_empty(self):
+        """
+        Checks if nothing has been typed.
+        """
+        return not self.chars
+
+    def is_empty_or_zero(self):
+        """
+        Checks if the number is "" or "0".
+        """
+        return not self.chars or (len(self.chars) == 1 and self.chars[0] == "0")
+
+    def last(self):
+        """
+        Returns the last character, or "" if the buffer is empty.
+        """
+        return self.chars[-1] if self.chars else ""
+
+    def __len__(self):
+        """
+        Returns the number of characters.
+        """
+        return len(self.chars)
+
+    def render(self):
+        """
+        Returns the number as a string; the string is built only when it changed.
+        """
+        if self.rendered is None:
+            self.rendered = "".join(self.chars)
+        return self.rendered
+
+
+class TokenBuffer:
+    """
+    The TokenBuffer class holds an expression as a list of typed tokens
+    (numbers and operators) with an O(1) append and operator replacement.
+    The expression string is rendered only when read: the texts added since
+    the last read are joined onto the string rendered so far, except for the
+    last token, which stays apart so that it can still be replaced.
+    """
+
+    def __init__(self):
+        """
+        Creates an empty buffer.
+        """
+        self.tokens = []
+        self.clear()
+
+    def append_number(self, text, has_decimal_point=False):
+        """
+        Appends a number as one token; an empty number is ignored.
+        """
+        if not text:
+            return
+        self.tokens.append(Token(text, False, has_decimal_point))
+        self.chunks.append(text)
+        self.rendered = None
+
+    def append_operator(self, operator):
+        """
+        Appends an operator token.
+        """
+        self.tokens.append(Token(operator, True, False))
+        self.chunks.append(operator)
+        self.rendered = None
+
+    def replace_operator(self, operator):
+        """
+        Replaces the last token with another operator.
+        """
+        self.tokens[-1] = Token(operator, True, False)
+        self.chunks[-1] = operator
+        self.rendered = None
+
+    def ends_with(self, characters):
+        """
+        Checks if the last character of the expression is one of characters.
+        """
+        return bool(self.tokens) and self.tokens[-1].text[-1] in characters
+
+    def clear(self):
+        """
+        Removes all tokens.
+        """
+        self.tokens.clear()
+        # Rendered text of all tokens but the last ones, still in chunks
+        self.prefix = ""
+        self.chunks = []
+        self.rendered = ""
+
+    def __bool__(self):
+        """
+        Checks if the buffer has any token.
+        """
+        return bool(self.tokens)
+
+    def render(self):
+        """
+        Returns the expression as a string; the string is built only when it changed.
+        """
+        if self.rendered is None:
+            if len(self.chunks) > 1:
+                self.prefix += "".join(self.chunks[:-1])
+                del self.chunks[:-1]
+            self.rendered = self.prefix + self.chunks[-1]
+        return self.rendered
@@ -0,0 +1,210 @@
+"""
+Calculation history tape: every evaluated expression and its result,
+kept across restarts in an append-only log file.
+A second file holds one fixed-size record (offset, length) per entry,
+so appending is O(1) and any entry is found without reading the log.
+Both files are read through memory maps; only a bounded window of the
+most recent entries is kept in memory.
+Several calculators can share the files: changes are made under a lock.
+"""
+import mmap
+import os
+import struct
+from collections import deque, namedtuple
+from contextlib import contextmanager
+
+try:
+    import fcntl
+except ImportError:
+    # No advisory locks (e.g. on Windows): appends still read the file sizes again
+    fcntl = None
+
+# Default location of the history log; the index is stored next to it
+DEFAULT_HISTORY_PATH = os.path.join(os.path.expanduser("~"), ".calculator_history")
+
+# Number of most recent entries kept in memory
+DEFAULT_WINDOW_SIZE = 1000
+
+# Index record of an entry: offset and length of its line in the log
+RECORD = struct.Struct("<QI")
+
+# Suffix of the index file
+INDEX_SUFFIX = ".idx"
+
+HistoryEntry = namedtuple("HistoryEntry", ("expression", "result"))
+
+
+class History:
+    """
+    The History class appends entries to the history log and recalls
+    them by position (0 is the oldest, -1 the most recent).
+    Each entry is stored in the log as an "expression<TAB>result" line.
+    """
+
+    def __init__(self, path=DEFAULT_HISTORY_PATH, window_size=DEFAULT_WINDOW_SIZE):
+        """
+        Opens (or creates) the history log at path and its index.
+        The index is repaired if it does not match the log (see recover()).
+        """
+        self.path = path
+        self.log_file = open(path, "a+b")
+        self.index_file = open(path + INDEX_SUFFIX, "a+b")
+        self.log_map = None
+        self.index_map = None
+
+        with self.locked():
+            self.count = os.fstat(self.index_file.fileno()).st_size // RECORD.size
+            self.log_size = 0
+            self.recover(os.fstat(self.log_file.fileno()).st_size)
+
+        # Most recent entries, the oldest first
+        self.window = deque(maxlen=window_size)
+        for position in range(max(self.count - window_size, 0), self.count):
+            self.window.append(self.read(position))
+
+    def recover(self, log_size):
+        """
+        Makes the index match the log after an interrupted write or a lost index:
+        - index records that do not end on a complete line of the log are dropped
+        - complete lines of the log missing from the index are indexed again
+        - only a torn line after the last complete one is cut from the log
+        """
+        while self.count:
+            offset, length = self.read_record(self.count - 1)
+            end = offset + length
+            if end <= log_size and self.mapped_log(log_size)[end - 1:end] == b"\n":
+                self.log_size = end
+                break
+            self.count -= 1
+
+        records = []
+        if log_size > self.log_size:
+            log_map = self.mapped_log(log_size)
+            start = self.log_size
+            newline = log_map.find(b"\n", start)
+            while newline >= 0:
+                records.append(RECORD.pack(start, newline + 1 - start))
+                start = newline + 1
+                newline = log_map.find(b"\n", start)
+            self.log_size = start
+
+        self.close_maps()
+        self.index_file.truncate(self.count * RECORD.size)
+        if records:
+            self.index_file.write(b"".join(records))
+            self.index_file.flush()
+            self.count += len(records)
+        self.log_file.truncate(self.log_size)
+
+    @contextmanager
+    def locked(self):
+        """
+        Holds an exclusive lock on the log, so that another calculator sharing
+        the history does not write between the log line and its index record.
+        """
+        if fcntl is not None:
+            fcntl.flock(self.log_file.fileno(), fcntl.LOCK_EX)
+        try:
+            yield
+        finally:
+            if fcntl is not None:
+                fcntl.flock(self.log_file.fileno(), fcntl.LOCK_UN)
+
+    def __len__(self):
+        """
+        Returns the number of entries.
+        """
+        return self.count
+
+    def append(self, expression, result):
+        """
+        Records an evaluated expression and its result at the end of the history.
+        """
+        data = f"{expression}\t{result}\n".encode("utf-8")
+        with self.locked():
+            # Another calculator may have appended entries since the last append
+            log_size = os.fstat(self.log_file.fileno()).st_size
+            count = os.fstat(self.index_file.fileno()).st_size // RECORD.size
+            # The log is written first, so an index record never points past its end
+            self.log_file.write(data)
+            self.log_file.flush()
+            self.index_file.write(RECORD.pack(log_size, len(data)))
+            self.index_file.flush()
+        if count != self.count:
+            # The window no longer holds the most recent entries; the others are read from the files
+            self.window.clear()
+        self.log_size = log_size + len(data)
+        self.count = count + 1
+        self.window.append(HistoryEntry(expression, result))
+
+    def entry(self, position):
+        """
+        Returns the entry at position (negative positions count from the end).
+        Raises IndexError if there is no such entry.
+        """
+        if position < 0:
+            position += self.count
+        if not 0 <= position < self.count:
+            raise IndexError("History position out of range")
+        window_start = self.count - len(self.window)
+        if position >= window_start:
+            return self.window[position - window_start]
+        return self.read(position)
+
+    def recent(self, count):
+        """
+        Returns up to count most recent entries, the oldest first.
+        """
+        return [self.entry(position) for position in range(max(self.count - count, 0), self.count)]
+
+    def read_record(self, position):
+        """
+        Returns the (offset, length) index record of the entry at position.
+        """
+        self.index_map = self.mapped(self.index_file, self.index_map, (position + 1) * RECORD.size)
+        return RECORD.unpack_from(self.index_map, position * RECORD.size)
+
+    def mapped_log(self, size):
+        """
+        Returns a memory map of the log covering at least size bytes.
+        """
+        self.log_map = self.mapped(self.log_file, self.log_map, size)
+        return self.log_map
+
+    def read(self, position):
+        """
+        Reads the entry at position from the log.
+        """
+        offset, length = self.read_record(position)
+        expression, _, result = self.mapped_log(offset + length)[offset:offset + length].decode("utf-8").rstrip("\n").partition("\t")
+        return HistoryEntry(expression, result)
+
+    @staticmethod
+    def mapped(file, current, size):
+        """
+        Returns a read-only memory map of file covering at least size bytes,
+        reusing the current map when it is large enough.
+        """
+        if current is not None and len(current) >= size:
+            return current
+        if current is not None:
+            current.close()
+        return mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ)
+
+    def close_maps(self):
+        """
+        Releases the memory maps; they are created again when needed.
+        """
+        for current in (self.log_map, self.index_map):
+            if current is not None:
+                current.close()
+        self.log_map = None
+        self.index_map = None
+
+    def close(self):
+        """
+        Closes the history files.
+        """
+        self.close_maps()
+        self.log_file.close()
+        self.index_file.close()
@@ -0,0 +1,203 @@
+"""
+Opt-in instrumentation of the calculator's hot paths: call counts and
+latency histograms of the key and button handlers, the time of an
+evaluation split between parsing and computing, and label redraw counts.
+Nothing here is used unless instrumentation is enabled, so a normal
+session runs the handlers without any wrapper.
+"""
+import json
+import threading
+import time
+from bisect import bisect_left
+from collections import Counter
+from functools import wraps
+
+# Upper bounds of the latency histogram buckets, in microseconds
+# (1 us to about 1 s); slower calls go to one more, open-ended bucket
+HISTOGRAM_BOUNDS_US = tuple(2**exponent for exponent in range(21))
+
+# Default file the statistics are dumped to
+DEFAULT_STATS_PATH = "calculator_stats.json"
+
+
+class LatencyStats:
+    """
+    The LatencyStats class keeps the call count, total and maximum
+    duration and a logarithmic latency histogram of one handler.
+    """
+
+    def __init__(self):
+        """
+        Starts with no calls.
+        """
+        self.count = 0
+        self.total = 0.0
+        self.max = 0.0
+        self.buckets = [0] * (len(HISTOGRAM_BOUNDS_US) + 1)
+
+    def add(self, seconds):
+        """
+        Records one call of the given duration.
+        """
+        self.count += 1
+        self.total += seconds
+        if seconds > self.max:
+            self.max = seconds
+        self.buckets[bisect_left(HISTOGRAM_BOUNDS_US, seconds * 1e6)] += 1
+
+    def merge(self, other):
+        """
+        Adds the calls recorded by another LatencyStats (e.g. from another process).
+        """
+        self.count += other.count
+        self.total += other.total
+        self.max = max(self.max, other.max)
+        self.buckets = [count + other_count for count, other_count in zip(self.buckets, other.buckets)]
+
+    def percentile(self, fraction):
+        """
+        Returns the upper bound (in microseconds) of the bucket holding the given
+        fraction of the calls, or the maximum for the open-ended bucket.
+        """
+        rank = fraction * self.count
+        seen = 0
+        for index, count in enumerate(self.buckets):
+            seen += count
+            if seen >= rank and count:
+                return HISTOGRAM_BOUNDS_US[index] if index < len(HISTOGRAM_BOUNDS_US) else self.max * 1e6
+        return 0.0
+
+    def to_dict(self):
+        """
+        Returns the statistics as a JSON-serializable dict.
+        """
+        bounds = [*HISTOGRAM_BOUNDS_US, None]
+        return {
+            "count": self.count,
+            "mean_us": self.total / self.count * 1e6 if self.count else 0.0,
+            "p50_us": self.percentile(0.50),
+            "p90_us": self.percentile(0.90),
+            "p99_us": self.percentile(0.99),
+            "max_us": self.max * 1e6,
+            "histogram": [[bound, count] for bound, count in zip(bounds, self.buckets) if count],
+        }
+
+
+class Instrumentation:
+    """
+    The Instrumentation class collects the statistics of one session.
+    Handlers are timed by wrapping them with wrap(); the evaluator is
+    timed by instrument_evaluator(). Statistics can be recorded from
+    the UI thread and the worker thread.
+    """
+
+    def __init__(self, stats_path=DEFAULT_STATS_PATH):
+        """
+        Starts an empty session; dump() writes to stats_path.
+        """
+        self.stats_path = stats_path
+        self.stats = {}
+        self.redraws = Counter()
+        self.renders = 0
+        self.started = time.monotonic()
+        self.lock = threading.Lock()
+
+    def record(self, name, seconds):
+        """
+        Records one call of the handler name.
+        """
+        with self.lock:
+            stats = self.stats.get(name)
+            if stats is None:
+                stats = self.stats[name] = LatencyStats()
+            stats.add(seconds)
+
+    def count_render(self, redrawn_labels):
+        """
+        Records one render of the labels and which labels were redrawn.
+        """
+        self.renders += 1
+        self.redraws.update(redrawn_labels)
+
+    def wrap(self, name, function):
+        """
+        Returns function timed under name.
+        """
+        clock = time.perf_counter
+        record = self.record
+
+        @wraps(function)
+        def timed(*args, **kwargs):
+            start = clock()
+            try:
+                return function(*args, **kwargs)
+            finally:
+                record(name, clock() - start)
+        return timed
+
+    def instrument_evaluator(self, evaluator):
+        """
+        Times the evaluator's evaluations split between parsing
+        (including cache lookups) and computing the result.
+        """
+        clock = time.perf_counter
+        compile_expression = evaluator.compile
+        evaluate = evaluator.evaluate
+        # Parsing time of the evaluation running in the current thread
+        parsing = threading.local()
+
+        def timed_compile(expression):
+            start = clock()
+            try:
+                return compile_expression(expression)
+            finally:
+                parsing.seconds += clock() - start
+
+        def timed_evaluate(expression):
+            parsing.seconds = 0.0
+            start = clock()
+            try:
+                return evaluate(expression)
+            finally:
+                total = clock() - start
+                self.record("evaluate: parse", parsing.seconds)
+                self.record("evaluate: compute", total - parsing.seconds)
+
+        # evaluate() looks compile() up on the instance, so it goes through timed_compile()
+        evaluator.compile = timed_compile
+        evaluator.evaluate = timed_evaluate
+
+    def to_dict(self):
+        """
+        Returns all statistics as a JSON-serializable dict.
+        """
+        with self.lock:
+            handlers = {name: stats.to_dict() for name, stats in sorted(self.stats.items())}
+        return {
+            "uptime_s": time.monotonic() - self.started,
+            "handlers": handlers,
+            "renders": self.renders,
+            "redraws": dict(self.redraws),
+        }
+
+    def summary(self):
+        """
+        Returns the statistics as lines of text for the debug overlay.
+        """
+        lines = [f"{'handler':<22}{'calls':>7}{'mean us':>9}{'p99 us':>9}"]
+        with self.lock:
+            for name, stats in sorted(self.stats.items()):
+                mean = stats.total / stats.count * 1e6
+                lines.append(f"{name:<22}{stats.count:>7}{mean:>9.0f}{stats.percentile(0.99):>9.0f}")
+        redraws = ", ".join(f"{name} {count}" for name, count in sorted(self.redraws.items()))
+        lines.append(f"renders {self.renders}; redraws: {redraws or 'none'}")
+        return "\n".join(lines)
+
+    def dump(self, path=None):
+        """
+        Writes all statistics as JSON to path (stats_path by default) and returns the path.
+        """
+        path = path or self.stats_path
+        with open(path, "w", encoding="utf-8") as file:
+            json.dump(self.to_dict(), file, indent=2)
+        return path
@@ -0,0 +1,116 @@
+"""
+Load generator for the evaluation daemon (server.py): opens many concurrent
+connections, sends pipelined requests and reports the throughput
+(requests/sec) and the latency percentiles seen by the clients.
+
+Usage:
+    python src/loadgen.py [--socket PATH] [--connections N] [--requests N] [--pipeline N]
+"""
+import argparse
+import asyncio
+import json
+import random
+import sys
+import time
+from benchmark import percentiles
+from server import DEFAULT_SOCKET_PATH
+
+# Default number of concurrent connections
+DEFAULT_CONNECTIONS = 100
+
+# Default number of requests sent on each connection
+DEFAULT_REQUESTS = 1000
+
+# Default number of requests a connection has in flight at once
+DEFAULT_PIPELINE = 16
+
+
+def make_request(request_id, rng):
+    """
+    Returns a random request like the ones the calculator buttons produce.
+    """
+    operation = rng.choice(("evaluate", "evaluate", "square", "sqrt"))
+    if operation == "evaluate":
+        expression = f"{rng.randint(0, 9999)}{rng.choice('+-*/')}{rng.randint(0, 999)}*{rng.randint(1, 99)}"
+    else:
+        expression = f"{rng.uniform(-10, 1000):.3f}"
+    return {"id": request_id, "op": operation, "expression": expression}
+
+
+async def run_connection(path, count, pipeline, seed, latencies, errors):
+    """
+    Sends count requests on one connection with at most pipeline in flight,
+    appending the latency of each response to latencies.
+    """
+    reader, writer = await asyncio.open_unix_connection(path)
+    rng = random.Random(seed)
+    window = asyncio.Semaphore(pipeline)
+    sent = {}
+
+    async def send():
+        for request_id in range(count):
+            await window.acquire()
+            sent[request_id] = time.perf_counter()
+            writer.write(json.dumps(make_request(request_id, rng)).encode("utf-8") + b"\n")
+            await writer.drain()
+
+    async def receive():
+        for _ in range(count):
+            line = await reader.readline()
+            if not line:
+                raise ConnectionError("The server closed the connection")
+            response = json.loads(line)
+            latencies.append(time.perf_counter() - sent.pop(response["id"]))
+            if "error" in response:
+                errors.append(response["error"])
+            window.release()
+
+    try:
+        await asyncio.gather(send(), receive())
+    finally:
+        writer.close()
+        await writer.wait_closed()
+
+
+async def run_load(path, connections, requests, pipeline):
+    """
+    Runs all connections concurrently and returns the latencies,
+    the error messages and the elapsed time.
+    """
+    latencies = []
+    errors = []
+    start = time.perf_counter()
+    await asyncio.gather(*(run_connection(path, requests, pipeline, seed, latencies, errors) for seed in range(connections)))
+    return latencies, errors, time.perf_counter() - start
+
+
+def parse_args(argv=None):
+    """
+    Parses the command-line arguments of the load generator.
+    """
+    parser = argparse.ArgumentParser(description="Measure the throughput and latency of the evaluation daemon.")
+    parser.add_argument("-s", "--socket", default=DEFAULT_SOCKET_PATH, help="path of the daemon's Unix domain socket")
+    parser.add_argument("-c", "--connections", type=int, default=DEFAULT_CONNECTIONS, help="concurrent connections")
+    parser.add_argument("-n", "--requests", type=int, default=DEFAULT_REQUESTS, help="requests sent on each connection")
+    parser.add_argument("-p", "--pipeline", type=int, default=DEFAULT_PIPELINE, help="requests in flight per connection")
+    return parser.parse_args(argv)
+
+
+def main(argv=None):
+    """
+    Runs the load and reports requests/sec and the latency percentiles on stdout.
+    """
+    args = parse_args(argv)
+    latencies, errors, elapsed = asyncio.run(run_load(args.socket, args.connections, args.requests, args.pipeline))
+    stats = percentiles(latencies)
+    rate = stats["count"] / elapsed if elapsed > 0 else 0.0
+    print(f"{stats['count']} requests over {args.connections} connections in {elapsed:.3f} s ({rate:,.0f} req/sec)")
+    print(f"latency p50 {stats['p50_us']:.0f} us, p90 {stats['p90_us']:.0f} us, p99 {stats['p99_us']:.0f} us, max {stats['max_us']:.0f} us")
+    if errors:
+        print(f"{len(errors)} malformed requests, e.g. {errors[0]}", file=sys.stderr)
+        return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -1,9 +1,23 @@
-import customtkinter as ctk
-from asteval import Interpreter
-import random
-from itertools import chain
-import ctypes
+import time
+
+# Time the interpreter reached this module, used by --startup-profile
+STARTUP_TIME = time.perf_counter()
+
+import argparse
 import os
+import signal
+import sys
+import tkinter
+from collections import deque
+import customtkinter as ctk
+from background import BackgroundEvaluator, DEFAULT_TIMEOUT, DEFAULT_MAX_INPUT_LENGTH
+from engine import CalculatorEngine
+from history import History, DEFAULT_HISTORY_PATH
+from instrumentation import Instrumentation, DEFAULT_STATS_PATH
+from recorder import TraceWriter, session_path
+
+# Time spent importing the modules above
+IMPORT_TIME = time.perf_counter() - STARTUP_TIME
 
 # Color Palette for the Application
 PURPLE = "#9966CC"
@@ -18,6 +32,58 @@ LARGE_FONT_STYLE = ("Arial", 40)
 DIGITS_FONT_STYLE = ("Arial", 25, "bold")
 DEFAULT_FONT_STYLE = ("Arial", 25,  "bold")
 
+# Button styles used in the layout table
+BUTTON_STYLES = {
+    "digit": {"fg_color": WHITE, "text_color": LABEL_COLOR, "font": DIGITS_FONT_STYLE, "hover_color": OFF_WHITE},
+    "special": {"fg_color": WHITE, "text_color": LABEL_COLOR, "font": DEFAULT_FONT_STYLE, "hover_color": OFF_WHITE},
+    "operator": {"fg_color": PURPLE, "text_color": WHITE, "font": DEFAULT_FONT_STYLE, "hover_color": LABEL_COLOR},
+    "equals": {"fg_color": YELLOW, "text_color": WHITE, "font": DEFAULT_FONT_STYLE, "hover_color": LABEL_COLOR},
+}
+
+# Declarative layout of the button grid:
+# text, (row, column, columnspan), style, handler name, handler argument
+BUTTON_LAYOUT = (
+    ("CE", (0, 1, 1), "special", "clear_entry", None),
+    ("x²", (0, 2, 1), "special", "square", None),
+    ("√x", (0, 3, 1), "special", "sqrt", None),
+    ("\u00F7", (0, 4, 1), "operator", "append_operator", "/"),  # Division symbol (÷)
+    ("7", (1, 1, 1), "digit", "add_to_expression", 7),
+    ("8", (1, 2, 1), "digit", "add_to_expression", 8),
+    ("9", (1, 3, 1), "digit", "add_to_expression", 9),
+    ("\u00D7", (1, 4, 1), "operator", "append_operator", "*"),  # Multiplication symbol (×)
+    ("4", (2, 1, 1), "digit", "add_to_expression", 4),
+    ("5", (2, 2, 1), "digit", "add_to_expression", 5),
+    ("6", (2, 3, 1), "digit", "add_to_expression", 6),
+    ("+", (2, 4, 1), "operator", "append_operator", "+"),
+    ("1", (3, 1, 1), "digit", "add_to_expression", 1),
+    ("2", (3, 2, 1), "digit", "add_to_expression", 2),
+    ("3", (3, 3, 1), "digit", "add_to_expression", 3),
+    ("-", (3, 4, 1), "operator", "append_operator", "-"),
+    (".", (4, 1, 1), "digit", "add_to_expression", "."),
+    ("0", (4, 2, 1), "digit", "add_to_expression", 0),
+    ("=", (4, 3, 2), "equals", "evaluate", None),
+)
+
+# Shown on the preview line while a computation is running
+BUSY_MESSAGE = "(・・ ) ..."
+
+# Font and refresh interval of the debug overlay (F12, with --instrument)
+OVERLAY_FONT_STYLE = ("Courier", 11)
+OVERLAY_REFRESH_MS = 500
+
+# Interval between two checks for a statistics dump requested with SIGUSR1, in milliseconds
+DUMP_CHECK_MS = 250
+
+# Keys of the operations in a session trace
+OPERATION_KEYS = {"evaluate": "=", "square": "x²", "sqrt": "√x"}
+
+# Default file the --profile statistics are written to
+DEFAULT_PROFILE_PATH = "calculator.prof"
+
+# The taskbar ID and the .ico icon are only supported on Windows
+APP_ID = "com.batyrzhan.calculator"
+ICON_PATH = os.path.join(os.path.dirname(__file__), "../assets/calculator_icon.ico")
+
 class Calculator:
     """
     The Calculator class is a graphical calculator
@@ -25,141 +91,257 @@ class Calculator:
     It supports basic mathematical operations such as addition,
     subtraction, multiplication, division, squaring,
     and square root extraction.
+    The calculator state lives in a CalculatorEngine, this class only
+    builds the window and mirrors the engine state on the labels.
     """
 
-    def __init__(self):
+    def __init__(self, timeout=DEFAULT_TIMEOUT, max_input_length=DEFAULT_MAX_INPUT_LENGTH, exact_mode=False, history_path=None, instrumentation=None, record_path=None):
         """
         Initializes the main application window and configures the interface settings.
-        """
+        The display is shown first, the button grid is built right after.
+        timeout and max_input_length are the time (seconds) and size (characters)
+        budgets of one "=", "x²" or "√x" computation.
+        exact_mode uses exact (Fraction) arithmetic instead of floats.
+        history_path is the file every "=" is recorded to, None disables the history.
+        instrumentation is an Instrumentation that times the handlers, None disables it.
+        record_path is the file the session's input events are recorded to (see recorder),
+        None disables the recording.
+        """
+        # Duration of each startup stage, printed by --startup-profile
+        self.startup_timings = [("import", IMPORT_TIME)]
+        stage_start = time.perf_counter()
+
         self.window = ctk.CTk()
         self.window.geometry("375x667+4+4")
         self.window.resizable(0, 0)
         self.window.title("Calculator By Batyrzhan (@SielunSankari)")
+        self.apply_platform_integration()
+
+        # State machine behind the display (expressions, errors, emotions)
+        self.engine = CalculatorEngine(exact_mode=exact_mode)
 
-        # Error message to display when there is an invalid operation
-        self.ERROR_MESSAGE = "ERROR (￢_￢;)"
+        # Worker running "=", "x²" and "√x" outside the Tk main loop; exact
+        # arithmetic holds the GIL for long, so it runs in a worker process
+        self.background = BackgroundEvaluator(self.window, timeout, max_input_length, in_process=exact_mode)
+        # Keys pressed while a computation runs, handled once its result is shown
+        self.queued_keys = deque()
 
-        # Set the path to the calculator icon
-        ICON_PATH = os.path.join(os.path.dirname(__file__), "../assets/calculator_icon.ico")
-        app_id = "com.batyrzhan.calculator"
-        ctypes.windll.shell32.SetCurrentProcessExplicitAppUserModelID(app_id)  # Set the app's ID for better taskbar integration
-        self.window.iconbitmap(ICON_PATH)  # Apply the icon to the window
+        # Recorder of the input events, for replaying the session with replay.py
+        self.recorder = TraceWriter(record_path, self.engine.emotion, exact_mode, max_input_length) if record_path else None
 
-        # Initialize with a random emotion to display at the start
-        self.current_expression = self.get_random_emotion()
-        self.total_expression = ""
+        # Handlers are only wrapped when instrumentation is enabled
+        self.instrumentation = instrumentation
+        self.operation_start = None
+        self.debug_overlay = None
+        self.debug_overlay_visible = False
+        self.dump_requested = False
+        if instrumentation is not None:
+            self.enable_instrumentation()
 
         # Create the display frame and labels
         self.display_frame = self.create_display_frame()
-        self.total_label, self.label = self.create_display_labels()
-
-        # Dictionary to map digits and the decimal point to grid positions on the calculator
-        self.digits = {
-            7: (1, 1),  8: (1, 2),  9: (1, 3),
-            4: (2, 1),  5: (2, 2),  6: (2, 3),
-            1: (3, 1),  2: (3, 2),  3: (3, 3),
-            0: (4, 2),  '.': (4, 1),
-        }
-
-        # Dictionary to map operation symbols to their Unicode equivalents
-        self.operations = {
-            "/": "\u00F7",  # Division symbol (÷)
-            "*": "\u00D7",  # Multiplication symbol (×)
-            "+": "+",
-            "-": "-",
-        }
-
-        # Create the buttons frame and add all the buttons
+        self.total_label, self.label, self.preview_label = self.create_display_labels()
+
+        # Label texts are rendered at most once per frame, see schedule_render()
+        self.render_pending = False
+        self.rendered_texts = {}
+
+        # Bind keyboard keys for easy input using the keyboard
+        self.bind_keys()
+        stage_start = self.record_startup_stage("window", stage_start)
+
+        # Paint the window before building the rest of the widgets
+        self.window.update()
+        stage_start = self.record_startup_stage("first paint", stage_start)
+
+        # Create the buttons frame and add all the buttons from the layout table
         self.buttons_frame = self.create_buttons_frame()
         self.buttons_frame.rowconfigure(0, weight=1)
         for x in range(1, 5):
             self.buttons_frame.rowconfigure(x, weight=1)  # Allow rows 1 to 4 to expand equally
             self.buttons_frame.columnconfigure(x, weight=1)  # Allow columns 1 to 4 to expand equally
+        self.create_buttons()
+        stage_start = self.record_startup_stage("widget build", stage_start)
 
-        # Create digit buttons (0-9)
-        self.create_digit_buttons()
+        # History tape of evaluated expressions and the entry shown by Up/Down
+        self.history = self.open_history(history_path) if history_path else None
+        self.history_position = None
+        self.record_startup_stage("history", stage_start)
 
-        # Create operator buttons (+, -, *, /)
-        self.create_operator_buttons()
+    def record_startup_stage(self, stage, stage_start):
+        """
+        Records the duration of a startup stage and returns the start time of the next one.
+        """
+        now = time.perf_counter()
+        self.startup_timings.append((stage, now - stage_start))
+        return now
 
-        # Create special buttons (e.g., clear, equals, etc.)
-        self.create_special_buttons()
+    def print_startup_profile(self):
+        """
+        Prints the duration of each startup stage and the time to interactive.
+        """
+        for stage, seconds in self.startup_timings:
+            print(f"{stage:<14}{seconds * 1000:8.1f} ms")
+        print(f"{'interactive':<14}{(time.perf_counter() - STARTUP_TIME) * 1000:8.1f} ms")
 
-        # Bind keyboard keys for easy input using the keyboard
-        self.bind_keys()
+    def apply_platform_integration(self):
+        """
+        Sets the app's ID for better taskbar integration and applies the icon,
+        only on Windows where both are supported.
+        """
+        if sys.platform != "win32":
+            return
+        import ctypes
+        ctypes.windll.shell32.SetCurrentProcessExplicitAppUserModelID(APP_ID)
+        self.window.iconbitmap(ICON_PATH)
 
-    def get_random_emotion(self):
-        """
-        Returns a random emoticon to display at the start of the application.
-        """
-        self.emotions = [
-            "(¬‿¬)",
-            ":>",
-            "(≧◡≦)",
-            "(^_^)",
-            "(｡♥‿♥｡)",
-            "(≧ω≦)",
-            "(≧∇≦)/",
-            ":3",
-            "(˘︶˘).｡.:*♡",
-            "(✧ω✧)",
-            "(,,>﹏<,,)",
-            "(˶ᵔ ᵕ ᵔ˶)",
-        ]
-        return random.choice(self.emotions)
+    @staticmethod
+    def open_history(path):
+        """
+        Opens the history at path; if the files cannot be opened,
+        the calculator runs without a history.
+        """
+        try:
+            return History(path)
+        except OSError as e:
+            print(f"History disabled: {e}", file=sys.stderr)
+            return None
 
     def is_valid_expression(self):
         """
         Checks if the current expression is valid (not an error message).
         """
-        return self.current_expression != self.ERROR_MESSAGE
+        return self.engine.is_valid_expression()
 
     def bind_keys(self):
         """
         Binds keyboard keys to the corresponding actions.
         """
         # Binding for the Enter key to evaluate the expression
-        self.window.bind("<Return>", lambda event: self.evaluate() if self.is_valid_expression() else self.clear())
+        self.bind_key("<Return>", "evaluate", lambda event: self.evaluate() if self.is_valid_expression() else self.clear())
 
-        # Binding for the digits
-        for key in self.digits:
-            self.window.bind(str(key), lambda event, digit=key: self.add_to_expression(digit) if self.is_valid_expression() else self.clear())
-
-        # Binding for the operators (+-×÷)
-        for key in self.operations:
-            self.window.bind(key, lambda event, operator=key: self.append_operator(operator) if self.is_valid_expression() else self.clear())
+        # Binding for the digits and the operators (+-×÷)
+        for _, _, _, handler_name, argument in BUTTON_LAYOUT:
+            if handler_name in ("add_to_expression", "append_operator"):
+                handler = getattr(self, handler_name)
+                self.bind_key(str(argument), handler_name, lambda event, handler=handler, value=argument: handler(value) if self.is_valid_expression() else self.clear())
 
         # Binding for the "CE" (Backspace) key
-        self.window.bind("<BackSpace>", lambda event: self.clear_entry() if self.is_valid_expression() else self.clear())
+        self.bind_key("<BackSpace>", "clear_entry", lambda event: self.clear_entry() if self.is_valid_expression() else self.clear())
 
         # Binding for the "C" (Escape) key
-        self.window.bind("<Escape>", lambda event: self.clear())
+        self.bind_key("<Escape>", "clear", lambda event: self.clear())
+
+        # Bindings for scrolling the history into the current expression
+        self.bind_key("<Up>", "recall_history", lambda event: self.recall_history(-1))
+        self.bind_key("<Down>", "recall_history", lambda event: self.recall_history(1))
+
+        # Binding for pasting a whole expression (Ctrl+V)
+        self.bind_key("<Control-v>", "paste", lambda event: self.paste())
+        self.bind_key("<Control-V>", "paste", lambda event: self.paste())
+
+    def bind_key(self, sequence, handler_name, function):
+        """
+        Binds a key sequence to function, timed as "key: <handler_name>"
+        when instrumentation is enabled.
+        """
+        self.window.bind(sequence, self.instrumented(f"key: {handler_name}", function))
 
-    def create_special_buttons(self):
+    def instrumented(self, name, function):
         """
-        Creates special calculator buttons:
-        - CE (Clear Entry)
-        - = (Equals)
-        - x² (Square)
-        - √x (Square Root)
+        Returns function timed under name when instrumentation is enabled,
+        and function itself (without any wrapper) otherwise.
         """
-        self.create_clear_entry_button()
-        self.create_equals_button()
-        self.create_square_button()
-        self.create_sqrt_button()
+        if self.instrumentation is None:
+            return function
+        return self.instrumentation.wrap(name, function)
+
+    def enable_instrumentation(self):
+        """
+        Times the label renders and the evaluator, and sets up the ways to read the statistics:
+        F12 toggles the debug overlay, Ctrl+F12 dumps them to a file
+        (as does SIGUSR1 once run() starts the main loop).
+        """
+        # schedule_render() looks render_labels up on the instance, so it runs the timed one
+        self.render_labels = self.instrumentation.wrap("render", self.render_labels)
+        self.instrumentation.instrument_evaluator(self.engine.evaluator)
+
+        self.window.bind("<F12>", lambda event: self.toggle_debug_overlay())
+        self.window.bind("<Control-F12>", lambda event: self.dump_stats())
+
+    def toggle_debug_overlay(self):
+        """
+        Shows or hides the debug overlay with the instrumentation statistics.
+        """
+        if self.debug_overlay is None:
+            self.debug_overlay = ctk.CTkLabel(self.window, text="", anchor="nw", justify="left", fg_color=LABEL_COLOR, text_color=YELLOW, font=OVERLAY_FONT_STYLE)
+
+        self.debug_overlay_visible = not self.debug_overlay_visible
+        if self.debug_overlay_visible:
+            self.debug_overlay.place(x=0, y=0, relwidth=1, relheight=1)
+            self.refresh_debug_overlay()
+        else:
+            self.debug_overlay.place_forget()
+
+    def refresh_debug_overlay(self):
+        """
+        Updates the debug overlay while it is shown.
+        """
+        if not self.debug_overlay_visible:
+            return
+        self.debug_overlay.configure(text=self.instrumentation.summary())
+        self.window.after(OVERLAY_REFRESH_MS, self.refresh_debug_overlay)
+
+    def request_dump(self, signum, frame):
+        """
+        Handles SIGUSR1: asks check_dump_request() to dump the statistics.
+        """
+        self.dump_requested = True
+
+    def check_dump_request(self):
+        """
+        Dumps the statistics if a dump was requested; runs every DUMP_CHECK_MS.
+        """
+        if self.dump_requested:
+            self.dump_requested = False
+            self.dump_stats()
+        self.window.after(DUMP_CHECK_MS, self.check_dump_request)
+
+    def dump_stats(self):
+        """
+        Writes the instrumentation statistics to their file.
+        """
+        path = self.instrumentation.dump()
+        print(f"Statistics written to {path}", file=sys.stderr)
+
+    def create_buttons(self):
+        """
+        Creates all calculator buttons from the declarative BUTTON_LAYOUT table.
+        Each button is associated with its handler method.
+        """
+        for text, (row, column, columnspan), style, handler_name, argument in BUTTON_LAYOUT:
+            handler = getattr(self, handler_name)
+            command = handler if argument is None else (lambda handler=handler, value=argument: handler(value))
+            command = self.instrumented(f"button: {handler_name}", command)
+            button = ctk.CTkButton(self.buttons_frame, text=text, corner_radius=0, border_width=0, command=command, **BUTTON_STYLES[style])
+            button.grid(row=row, column=column, columnspan=columnspan, sticky="nsew")
 
     def create_display_labels(self):
         """
         Creates labels to display the current and total expressions on the calculator screen.
         - total_label: Displays the total expression (e.g., "12 + 17").
         - label: Displays the current value or result.
+        - preview_label: Displays the running result while typing (e.g., "= 29").
         """
-        total_label = ctk.CTkLabel(self.display_frame, text=self.total_expression, anchor="e", bg_color=LABEL_COLOR, text_color=WHITE, padx=24, font=SMALL_FONT_STYLE)
+        total_label = ctk.CTkLabel(self.display_frame, text=self.engine.total_display, anchor="e", bg_color=LABEL_COLOR, text_color=WHITE, padx=24, font=SMALL_FONT_STYLE)
         total_label.pack(expand=True, fill="both")
 
-        label = ctk.CTkLabel(self.display_frame, text=self.current_expression, anchor="e", bg_color=LABEL_COLOR, text_color=WHITE, padx=24, font=LARGE_FONT_STYLE)
+        label = ctk.CTkLabel(self.display_frame, text=self.engine.current_expression, anchor="e", bg_color=LABEL_COLOR, text_color=WHITE, padx=24, font=LARGE_FONT_STYLE)
         label.pack(expand=True, fill="both")
-        return total_label, label
+
+        preview_label = ctk.CTkLabel(self.display_frame, text="", anchor="e", bg_color=LABEL_COLOR, text_color=OFF_WHITE, padx=24, font=SMALL_FONT_STYLE)
+        preview_label.pack(expand=True, fill="both")
+        return total_label, label, preview_label
 
     def create_display_frame(self):
         """
@@ -176,74 +358,62 @@ class Calculator:
         If the current expression is a mistake or contains an emotion, it is cleared.
         Checks the correctness of adding a decimal point.
         """
-        if self.current_expression in (self.ERROR_MESSAGE, *chain(self.emotions)):
-            self.clear()
-
-        if self.current_expression in ("0"):
-            if value == "0":
-                return
-            elif value == ".":
-                self.current_expression = "0"
-            else:
-                self.current_expression = str(value)
-                self.update_label()
-                return
-
-        if value == ".":
-            if not self.current_expression or self.current_expression[-1] in self.operations:
-                self.current_expression = "0"
-            elif "." in self.current_expression:
-                return
-
-        self.current_expression += str(value)
+        if self.queue_while_busy(self.add_to_expression, value):
+            return
+        if self.recorder is not None:
+            self.recorder.record(str(value))
+        self.engine.add_to_expression(value)
+        self.update_total_label()
         self.update_label()
 
-    def create_digit_buttons(self):
-        """
-        Creates buttons for numbers (0-9) and decimal points.
-        Each button is associated with the method add_to_expression.
-        """
-        for digit, grid_values in self.digits.items():
-            button = ctk.CTkButton(self.buttons_frame, text=str(digit), fg_color=WHITE, text_color=LABEL_COLOR, font=DIGITS_FONT_STYLE, corner_radius=0, border_width=0, hover_color=OFF_WHITE, command=lambda digit_value=digit: self.add_to_expression(digit_value))
-            button.grid(row=grid_values[0], column=grid_values[1], sticky="nsew")
-
     def append_operator(self, operator):
         """
         Appends an operator to the current expression.
         If the current expression is a mistake or emotion, it is cleared.
         """
-        if self.current_expression in (self.ERROR_MESSAGE, *chain(self.emotions)):
-            self.current_expression = "0"
-            self.clear()
-        if not self.current_expression and not self.total_expression:
+        if self.queue_while_busy(self.append_operator, operator):
             return
-        if not self.current_expression and self.total_expression[-1] in self.operations:
-            self.total_expression = self.total_expression[:-1] + operator
-        else:
-            self.total_expression += self.current_expression + operator
-            self.current_expression = ""
-
+        if self.recorder is not None:
+            self.recorder.record(operator)
+        self.engine.append_operator(operator)
         self.update_total_label()
         self.update_label()
 
-    def create_operator_buttons(self):
+    def paste(self):
         """
-        Creates buttons for operators (+, -, *, /).
-        Each button is associated with the method append_operator.
+        Pastes an expression from the clipboard in one pass.
+        Clipboard contents that are not an expression are ignored.
         """
-        row_index = 0
-        for operator, symbol in self.operations.items():
-            button = ctk.CTkButton(self.buttons_frame, text=symbol, fg_color=PURPLE, text_color=WHITE, font=DEFAULT_FONT_STYLE, corner_radius=0, border_width=0, hover_color=LABEL_COLOR, command=lambda operator_symbol=operator: self.append_operator(operator_symbol))
-            button.grid(row=row_index, column=4, sticky="nsew")
-            row_index += 1
+        try:
+            text = self.window.clipboard_get()
+        except tkinter.TclError:
+            # The clipboard is empty or does not hold text
+            return
+        self.paste_text(text)
+
+    def paste_text(self, text):
+        """
+        Pastes an expression read from the clipboard.
+        """
+        if self.queue_while_busy(self.paste_text, text):
+            return
+        if self.engine.paste(text):
+            if self.recorder is not None:
+                self.recorder.record_text("paste", text)
+            self.update_total_label()
+            self.update_label()
 
     def clear(self):
         """
         Clears the current expression and total expression.
         Sets the starting value of "0" for the current expression.
         """
-        self.current_expression = "0"
-        self.total_expression = ""
+        self.background.cancel()
+        self.queued_keys.clear()
+        self.history_position = None
+        if self.recorder is not None:
+            self.recorder.record("C")
+        self.engine.clear()
         self.update_total_label()
         self.update_label()
 
@@ -252,96 +422,113 @@ class Calculator:
         Removes the last character from the current expression.
         If empty, sets the value to "0".
         """
-        if len(self.current_expression) > 1 and self.current_expression not in (self.ERROR_MESSAGE, "0", *chain(self.emotions)):
-            self.current_expression = self.current_expression[:-1]
-        else:
-            self.current_expression = "0"
-
+        if self.queue_while_busy(self.clear_entry):
+            return
+        if self.recorder is not None:
+            self.recorder.record("CE")
+        self.engine.clear_entry()
         self.update_label()
 
-    def create_clear_entry_button(self):
-        """
-        Creates a "CE" (Clear Entry) button to delete the last character.
-        """
-        button = ctk.CTkButton(self.buttons_frame, text="CE", fg_color=WHITE, text_color=LABEL_COLOR, font=DEFAULT_FONT_STYLE, corner_radius=0, hover_color=OFF_WHITE, border_width=0, command=self.clear_entry)
-        button.grid(row=0, column=1, sticky="nsew")
-
     def square(self):
         """
         Calculates the square of the current expression.
         If the expression is incorrect, an error message is displayed.
         """
-        try:
-            value = float(self.current_expression)
-            self.current_expression = str(round(value**2, 12))
-        except ValueError:
-            self.current_expression = self.ERROR_MESSAGE
-            self.update_label()
-        else:
-            self.update_label()
-
-    def create_square_button(self):
-        """
-        Creates the "x²" button to calculate the square of the current value.
-        """
-        button = ctk.CTkButton(self.buttons_frame, text="x²", fg_color=WHITE, text_color=LABEL_COLOR, font=DEFAULT_FONT_STYLE, corner_radius=0, hover_color=OFF_WHITE, border_width=0, command=self.square)
-        button.grid(row=0, column=2, sticky="nsew")
+        self.start_operation("square")
 
     def sqrt(self):
         """
         Calculates the square root of the current expression.
         If the expression is incorrect or the number is negative, an error message is displayed.
         """
-        try:
-            value = float(self.current_expression)
-            if value < 0:
-                raise ValueError("Square root of negative number is not possible")
-            self.current_expression = str(round(value**0.5, 12))
-        except ValueError as e:
-            self.current_expression = self.ERROR_MESSAGE
-            self.update_label()
-        else:
-            self.update_label()
-
-    def create_sqrt_button(self):
-        """
-        Creates the "√x" button to calculate the square root of the current value.
-        """
-        button = ctk.CTkButton(self.buttons_frame, text="√x", fg_color=WHITE, text_color=LABEL_COLOR, font=DEFAULT_FONT_STYLE, corner_radius=0, hover_color=OFF_WHITE, border_width=0, command=self.sqrt)
-        button.grid(row=0, column=3, sticky="nsew")
+        self.start_operation("sqrt")
 
     def evaluate(self):
         """
         Calculates the result of the total expression.
-        Uses a safe interpreter to evaluate the expression.
+        Uses the calculator's safe evaluator to evaluate the expression.
         If the expression is invalid, displays an error message.
         """
-        if self.current_expression == self.ERROR_MESSAGE:
-            self.clear()
+        self.start_operation("evaluate")
+
+    def start_operation(self, name):
+        """
+        Starts an engine operation ("evaluate", "square" or "sqrt") in the background worker.
+        While it runs, the preview line shows a busy indicator; "C" (Escape) cancels it
+        and other keys are queued until its result is shown.
+        """
+        if self.queue_while_busy(self.start_operation, name):
+            return
+        if self.recorder is not None:
+            self.recorder.record(OPERATION_KEYS[name])
+        operation = self.engine.start_operation(name)
+        self.update_total_label()
+        if operation is None:
+            self.update_label()
             return
 
-        self.total_expression += self.current_expression
+        function, argument = operation
+        if self.instrumentation is not None:
+            self.operation_start = time.perf_counter()
+        self.background.submit(function, argument, lambda result: self.finish_operation(name, result))
+        self.update_label()
+
+    def finish_operation(self, name, result):
+        """
+        Applies the result of a background operation to the display.
+        """
+        self.engine.finish_operation(name, result)
+        if self.instrumentation is not None:
+            # Time from the key press to the result, including the worker
+            self.instrumentation.record(f"{name}: result", time.perf_counter() - self.operation_start)
+        if name == "evaluate" and self.history is not None:
+            self.history.append(self.engine.total_display, self.engine.current_expression)
+            self.history_position = None
+        if self.recorder is not None:
+            self.recorder.check(self.engine.display)
         self.update_total_label()
+        self.update_label()
+        self.run_queued_keys()
 
-        try:
-            aeval = Interpreter()
-            result = aeval(self.total_expression)
-            if isinstance(result, (int, float)):
-                self.current_expression = str(round(result, 12))
-                self.total_expression = ""
-            else:
-                raise ValueError("Invalid result")
-        except Exception:
-            self.current_expression = self.ERROR_MESSAGE
-        finally:
-            self.update_label()
+    def queue_while_busy(self, handler, *args):
+        """
+        Queues a key handled while a computation is running, so it is handled
+        after the result like it would have been without the worker.
+        Returns True if the key was queued.
+        """
+        if not self.background.busy:
+            return False
+        self.queued_keys.append((handler, args))
+        return True
+
+    def run_queued_keys(self):
+        """
+        Handles the keys queued during a computation, in order,
+        until one of them starts another computation.
+        """
+        while self.queued_keys and not self.background.busy:
+            handler, args = self.queued_keys.popleft()
+            handler(*args)
 
-    def create_equals_button(self):
+    def recall_history(self, step):
         """
-        Creates the "=" (Equal) button to calculate the result of the total expression.
+        Moves through the history (step -1 is older, 1 is newer)
+        and shows the result of the selected entry as the current expression.
         """
-        button = ctk.CTkButton(self.buttons_frame, text="=", fg_color=YELLOW, text_color=WHITE, font=DEFAULT_FONT_STYLE, corner_radius=0, hover_color=LABEL_COLOR, border_width=0, command=self.evaluate)
-        button.grid(row=4, column=3, columnspan=2, sticky="nsew")
+        if self.queue_while_busy(self.recall_history, step) or not self.history:
+            return
+        if self.history_position is None:
+            if step > 0:
+                return
+            position = len(self.history) - 1
+        else:
+            position = min(max(self.history_position + step, 0), len(self.history) - 1)
+        self.history_position = position
+        result = self.history.entry(position).result
+        if self.recorder is not None:
+            self.recorder.record_text("recall", result)
+        self.engine.recall(result)
+        self.update_label()
 
     def create_buttons_frame(self):
         """
@@ -355,27 +542,107 @@ class Calculator:
         """
         Updates the label with the total expression.
         """
-        self.total_label.configure(text=self.total_expression)
+        self.schedule_render()
 
     def update_label(self):
         """
-        Updates the label with the current expression.
+        Updates the label with the current expression
+        and the preview label with the running result.
+        """
+        self.schedule_render()
+
+    def schedule_render(self):
+        """
+        Schedules one render of the labels for when Tk is idle, so any
+        number of keystrokes handled in the same frame cost a single redraw.
+        """
+        if self.render_pending:
+            return
+        self.render_pending = True
+        self.window.after_idle(self.render_labels)
+
+    def render_labels(self):
+        """
+        Shows the engine state on the labels, reconfiguring only the labels whose text changed.
+        While a computation is running, the preview label shows a busy indicator.
         """
-        self.label.configure(text=self.current_expression)
+        self.render_pending = False
+        if self.background.busy:
+            preview = BUSY_MESSAGE
+        else:
+            preview = self.engine.preview
+            preview = f"= {preview}" if preview else ""
+
+        redrawn = []
+        for name, label, text in (("total", self.total_label, self.engine.total_display), ("current", self.label, self.engine.current_expression), ("preview", self.preview_label, preview)):
+            if self.rendered_texts.get(name) != text:
+                self.rendered_texts[name] = text
+                label.configure(text=text)
+                redrawn.append(name)
+        if self.instrumentation is not None:
+            self.instrumentation.count_render(redrawn)
 
     def run(self):
         """
         Runs the main application window.
         """
+        if self.instrumentation is not None and hasattr(signal, "SIGUSR1"):
+            # Python signal handlers only run when Tk hands control back to Python,
+            # so the handler just flags the request and a periodic check dumps
+            signal.signal(signal.SIGUSR1, self.request_dump)
+            self.window.after(DUMP_CHECK_MS, self.check_dump_request)
         self.window.mainloop()
+        if self.recorder is not None:
+            # A computation still pending has no result to compare in a replay
+            if not self.background.busy:
+                self.recorder.check(self.engine.display)
+            self.recorder.close()
+        self.background.shutdown()
+        if self.history is not None:
+            self.history.close()
+        if self.instrumentation is not None:
+            self.dump_stats()
+
+def parse_args(argv=None):
+    """
+    Parses the command-line arguments of the application.
+    """
+    parser = argparse.ArgumentParser(description="Calculator By Batyrzhan (@SielunSankari)")
+    parser.add_argument("--startup-profile", action="store_true", help="print the duration of each startup stage")
+    parser.add_argument("--timeout", type=float, default=DEFAULT_TIMEOUT, help="time budget of one computation, in seconds")
+    parser.add_argument("--exact", action="store_true", help="use exact arithmetic instead of floats")
+    parser.add_argument("--history", default=DEFAULT_HISTORY_PATH, help="file the history of calculations is kept in")
+    parser.add_argument("--no-history", action="store_true", help="do not record the history of calculations")
+    parser.add_argument("--instrument", action="store_true", help="time the handlers (F12: overlay, Ctrl+F12 or SIGUSR1: dump)")
+    parser.add_argument("--stats-file", default=DEFAULT_STATS_PATH, help="file the --instrument statistics are dumped to")
+    parser.add_argument("--profile", nargs="?", const=DEFAULT_PROFILE_PATH, metavar="FILE", help="run the session under cProfile and write the stats to FILE")
+    parser.add_argument("--record", metavar="DIR", help="record the session's input events to a trace file in DIR")
+    parser.add_argument("--max-input-length", type=int, default=DEFAULT_MAX_INPUT_LENGTH, help="size budget of one computation, in characters")
+    return parser.parse_args(argv)
 
 if __name__ == "__main__":
     """
     Main entry point for the calculator application.
     Creates an instance of the Calculator class and runs the main application window.
     """
-    calc = Calculator()
-    calc.run()
+    args = parse_args()
+    if args.profile:
+        import cProfile
+        profiler = cProfile.Profile()
+        profiler.enable()
+
+    instrumentation = Instrumentation(args.stats_file) if args.instrument else None
+    calc = Calculator(args.timeout, args.max_input_length, args.exact, None if args.no_history else args.history, instrumentation,
+                      session_path(args.record) if args.record else None)
+    if args.startup_profile:
+        calc.print_startup_profile()
+    try:
+        calc.run()
+    finally:
+        if args.profile:
+            # Only the UI thread is profiled, see --instrument for the worker's timings
+            profiler.disable()
+            profiler.dump_stats(args.profile)
 
 # ⠀⠀⠀⠀⠀⠀⠀⠀⠀⠀⠀⠀⠀⠀⠀⠀⠀⠀⠀⠀⠀⠀⠀⠀⠀⠀⠀⠀⣴⣿⣦⡀⠀⠀⠀⠀⠀⠀⠀⠀⠀⠀⠀⠀⠀⣠⠜⠳⣄
 # ⠀⠀⠀⠀⠀⠀⠀⠀⠀⠀⠀⠀⠀⠀⠀⠀⠀⠀⠀⠀⠀⠀⠀⠀⠀⠀⣠⣾⣿⣿⣿⣿⣦⠀⠀⠀⠀⠀⠀⠀⠀⠀⠀⢀⡜⠁⠀⠀⠘⢳⡀
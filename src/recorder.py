@@ -0,0 +1,153 @@
+"""
+Keystroke session traces: a compact binary record of the input events
+of one calculator session, replayed headlessly by replay.py.
+
+A trace starts with a header (magic, exact mode flag, size budget, start
+emotion), followed by one byte per key (digits, ".", operators, "CE", "C",
+"=", "x²", "√x"). Pasted and recalled texts are stored with their length,
+and every result of "=", "x²" or "√x" is followed by a checkpoint holding
+the CRC-32 of the display, so a replay can detect diverging output.
+"""
+import os
+import struct
+import time
+import zlib
+
+# First bytes of every trace file
+MAGIC = b"CALCTRC1"
+
+# Header after the magic: flags, size budget, length of the emotion in bytes
+HEADER = struct.Struct("<BIB")
+EXACT_MODE_FLAG = 1
+
+# Keys stored as a single byte: their index in this tuple
+KEYS = ("0", "1", "2", "3", "4", "5", "6", "7", "8", "9", ".", "+", "-", "*", "/", "CE", "C", "=", "x²", "√x")
+KEY_BYTES = {key: bytes((code,)) for code, key in enumerate(KEYS)}
+
+# Events with a payload: a pasted text, a text recalled from the history, a display checkpoint
+PASTE = 0x80
+RECALL = 0x81
+CHECK = 0x82
+TEXT_EVENTS = {"paste": PASTE, "recall": RECALL}
+TEXT_LENGTH = struct.Struct("<I")
+CHECKSUM = struct.Struct("<I")
+
+# Write buffer of a trace file, in bytes
+BUFFER_SIZE = 1 << 16
+
+
+class TraceFormatError(ValueError):
+    """
+    Raised when a file is not a valid session trace.
+    """
+
+
+def display_checksum(display):
+    """
+    Returns the CRC-32 of a (total_display, current_expression) display state.
+    """
+    return zlib.crc32("\n".join(display).encode("utf-8"))
+
+
+def session_path(directory):
+    """
+    Returns a new trace file path in directory for the current session.
+    """
+    os.makedirs(directory, exist_ok=True)
+    return os.path.join(directory, f"session-{time.strftime('%Y%m%d-%H%M%S')}-{os.getpid()}.trace")
+
+
+class TraceWriter:
+    """
+    The TraceWriter class records the input events of a session to a trace file.
+    Writes are buffered, so recording a key costs one small in-memory write.
+    """
+
+    def __init__(self, path, emotion, exact_mode=False, max_input_length=0):
+        """
+        Creates the trace file and writes its header.
+        """
+        self.path = path
+        self.file = open(path, "wb", buffering=BUFFER_SIZE)
+        emotion = emotion.encode("utf-8")
+        self.file.write(MAGIC)
+        self.file.write(HEADER.pack(EXACT_MODE_FLAG if exact_mode else 0, max_input_length, len(emotion)))
+        self.file.write(emotion)
+
+    def record(self, key):
+        """
+        Records a key, one of KEYS.
+        """
+        self.file.write(KEY_BYTES[key])
+
+    def record_text(self, event, text):
+        """
+        Records a "paste" or "recall" event with its text.
+        """
+        data = text.encode("utf-8")
+        self.file.write(bytes((TEXT_EVENTS[event],)))
+        self.file.write(TEXT_LENGTH.pack(len(data)))
+        self.file.write(data)
+
+    def check(self, display):
+        """
+        Records a checkpoint of the display state.
+        """
+        self.file.write(bytes((CHECK,)))
+        self.file.write(CHECKSUM.pack(display_checksum(display)))
+
+    def close(self):
+        """
+        Writes the buffered events and closes the trace file.
+        """
+        self.file.close()
+
+
+def read_trace(path):
+    """
+    Reads a trace file and returns its header as a dict and its events
+    as a list of (event, payload) pairs: (key, None), ("paste", text),
+    ("recall", text) or ("check", checksum). An event cut off at the end
+    of the file (e.g. by an interrupted session) is dropped.
+    Raises TraceFormatError if the file is not a valid trace.
+    """
+    with open(path, "rb") as file:
+        data = file.read()
+    if not data.startswith(MAGIC) or len(data) < len(MAGIC) + HEADER.size:
+        raise TraceFormatError(f"Not a session trace: {path}")
+
+    flags, max_input_length, emotion_length = HEADER.unpack_from(data, len(MAGIC))
+    position = len(MAGIC) + HEADER.size
+    header = {
+        "exact_mode": bool(flags & EXACT_MODE_FLAG),
+        "max_input_length": max_input_length,
+        "emotion": data[position:position + emotion_length].decode("utf-8"),
+    }
+    position += emotion_length
+
+    events = []
+    text_events = {code: event for event, code in TEXT_EVENTS.items()}
+    end = len(data)
+    while position < end:
+        code = data[position]
+        position += 1
+        if code < len(KEYS):
+            events.append((KEYS[code], None))
+        elif code in text_events:
+            if position + TEXT_LENGTH.size > end:
+                break
+            (length,) = TEXT_LENGTH.unpack_from(data, position)
+            position += TEXT_LENGTH.size
+            if position + length > end:
+                break
+            events.append((text_events[code], data[position:position + length].decode("utf-8")))
+            position += length
+        elif code == CHECK:
+            if position + CHECKSUM.size > end:
+                break
+            (checksum,) = CHECKSUM.unpack_from(data, position)
+            position += CHECKSUM.size
+            events.append(("check", checksum))
+        else:
+            raise TraceFormatError(f"Unknown event {code} at byte {position - 1} of {path}")
+    return header, events
@@ -0,0 +1,253 @@
+"""
+Headless replayer of session traces (see recorder) for soak testing:
+drives the Calculator handlers at maximum speed from many traces,
+in parallel across processes, with customtkinter replaced by the
+benchmark's stand-in.
+Reports the throughput, the per-event latency, every checkpoint where
+the replayed display differs from the recorded one and, with --memory,
+the memory growth of each worker over time (tracing allocations slows
+the replay, so the latency of such a run is not representative).
+
+Usage:
+    python src/replay.py TRACE_OR_DIR... [--processes N] [--memory] [--output RESULTS.json]
+"""
+import argparse
+import gc
+import json
+import multiprocessing
+import os
+import sys
+import time
+import tracemalloc
+from benchmark import install_fake_customtkinter
+from evaluator import Evaluator
+from instrumentation import LatencyStats
+from recorder import read_trace, display_checksum
+
+# Traces replayed by a worker between two memory samples; a worker is also
+# sampled after its first trace and once all traces are replayed
+MEMORY_SAMPLE_INTERVAL = 50
+
+# Divergences listed in the report
+MAX_REPORTED_DIVERGENCES = 20
+
+# Calculator module of the current worker process and its memory tracking state,
+# set up by init_worker
+worker_main = None
+worker_state = None
+
+
+def init_worker(memory_barrier):
+    """
+    Installs the customtkinter stand-in and imports the calculator once per worker process.
+    memory_barrier is the Barrier of final_memory_sample(), or None to not track memory.
+    """
+    global worker_main, worker_state
+    install_fake_customtkinter()
+    import main
+    worker_main = main
+    worker_state = {"memory_barrier": memory_barrier, "traces": 0, "events": 0}
+    if memory_barrier is not None:
+        # Load the lazily imported interpreter first, so it does not count as growth
+        Evaluator().interpreter
+        tracemalloc.start()
+
+
+def sample_memory():
+    """
+    Returns a (pid, events replayed, traced bytes) memory sample of the worker.
+    """
+    gc.collect()
+    return os.getpid(), worker_state["events"], tracemalloc.get_traced_memory()[0]
+
+
+def final_memory_sample(_):
+    """
+    Returns the last memory sample of a worker. Each worker waits at the barrier
+    after taking one of these tasks, so mapping it over as many tasks as there are
+    workers samples every worker exactly once.
+    """
+    worker_state["memory_barrier"].wait()
+    return sample_memory()
+
+
+def replay_actions(calculator):
+    """
+    Returns the handler of every trace event except checkpoints.
+    """
+    actions = {str(digit): (lambda value=digit: calculator.add_to_expression(value)) for digit in range(10)}
+    actions["."] = lambda: calculator.add_to_expression(".")
+    for operator in ("+", "-", "*", "/"):
+        actions[operator] = lambda operator=operator: calculator.append_operator(operator)
+    actions.update({
+        "CE": calculator.clear_entry,
+        "C": calculator.clear,
+        "=": calculator.evaluate,
+        "x²": calculator.square,
+        "√x": calculator.sqrt,
+    })
+    return actions
+
+
+def recall(calculator, text):
+    """
+    Shows a recalled history result, as recall_history() does with the recorded history.
+    """
+    calculator.engine.recall(text)
+    calculator.update_label()
+
+
+def paste(calculator, text):
+    """
+    Pastes a recorded text through the fake clipboard.
+    """
+    calculator.window.clipboard = text
+    calculator.paste()
+
+
+def replay_trace(path):
+    """
+    Replays one trace in a fresh Calculator and returns its statistics:
+    event count, elapsed time, latency histogram, divergences and, when memory
+    is tracked, a memory sample of the worker after its first trace and then
+    every MEMORY_SAMPLE_INTERVAL traces.
+    """
+    header, events = read_trace(path)
+    calculator = worker_main.Calculator(exact_mode=header["exact_mode"], max_input_length=header["max_input_length"] or sys.maxsize)
+    calculator.engine.emotion = header["emotion"]
+    window = calculator.window
+    actions = replay_actions(calculator)
+    latencies = LatencyStats()
+    divergences = []
+    clock = time.perf_counter
+
+    start = clock()
+    try:
+        window.run_pending()
+        for index, (event, payload) in enumerate(events):
+            if event == "check":
+                if display_checksum(calculator.engine.display) != payload:
+                    divergences.append({"trace": path, "event": index, "display": list(calculator.engine.display)})
+                continue
+            event_start = clock()
+            if event == "paste":
+                paste(calculator, payload)
+            elif event == "recall":
+                recall(calculator, payload)
+            else:
+                actions[event]()
+            window.run_pending()
+            latencies.add(clock() - event_start)
+    finally:
+        calculator.background.shutdown()
+    elapsed = clock() - start
+
+    worker_state["traces"] += 1
+    worker_state["events"] += latencies.count
+    memory = None
+    if worker_state["memory_barrier"] is not None and \
+            (worker_state["traces"] == 1 or worker_state["traces"] % MEMORY_SAMPLE_INTERVAL == 0):
+        memory = sample_memory()
+    return {"events": latencies.count, "elapsed": elapsed, "latencies": latencies, "divergences": divergences, "memory": memory}
+
+
+def find_traces(paths):
+    """
+    Returns the trace files of the given files and directories (*.trace files).
+    """
+    traces = []
+    for path in paths:
+        if os.path.isdir(path):
+            traces.extend(sorted(os.path.join(path, name) for name in os.listdir(path) if name.endswith(".trace")))
+        else:
+            traces.append(path)
+    return traces
+
+
+def run_replay(traces, processes=None, track_memory=False):
+    """
+    Replays the traces across a process pool and returns the aggregated results.
+    """
+    processes = processes or multiprocessing.cpu_count()
+    latencies = LatencyStats()
+    divergences = []
+    memory = {}
+    event_count = 0
+    memory_barrier = multiprocessing.Barrier(processes) if track_memory else None
+
+    start = time.perf_counter()
+    with multiprocessing.Pool(processes, initializer=init_worker, initargs=(memory_barrier,)) as pool:
+        for result in pool.imap_unordered(replay_trace, traces, chunksize=max(1, len(traces) // (processes * 8))):
+            event_count += result["events"]
+            latencies.merge(result["latencies"])
+            divergences.extend(result["divergences"])
+            if result["memory"] is not None:
+                pid, events, size = result["memory"]
+                memory.setdefault(pid, []).append((events, size))
+        elapsed = time.perf_counter() - start
+        if track_memory:
+            for pid, events, size in pool.map(final_memory_sample, range(processes), chunksize=1):
+                memory.setdefault(pid, []).append((events, size))
+    for samples in memory.values():
+        samples.sort()
+
+    return {
+        "traces": len(traces),
+        "events": event_count,
+        "elapsed_s": elapsed,
+        "events_per_second": event_count / elapsed if elapsed > 0 else 0.0,
+        "latency": latencies.to_dict(),
+        "memory": [
+            {"events": samples[-1][0], "first_kb": samples[0][1] / 1024, "last_kb": samples[-1][1] / 1024,
+             "samples": [[events, size / 1024] for events, size in samples]}
+            for samples in memory.values()
+        ],
+        "divergences": divergences,
+    }
+
+
+def print_report(results, output=sys.stdout):
+    """
+    Prints the results of a replay.
+    """
+    latency = results["latency"]
+    print(f"{results['traces']} traces, {results['events']} events in {results['elapsed_s']:.3f} s "
+          f"({results['events_per_second']:,.0f} events/sec)", file=output)
+    print(f"latency per event: mean {latency['mean_us']:.1f} us, p50 <= {latency['p50_us']:.0f} us, "
+          f"p99 <= {latency['p99_us']:.0f} us, max {latency['max_us']:.0f} us", file=output)
+    for index, worker in enumerate(results["memory"]):
+        print(f"worker {index}: memory {worker['first_kb']:.1f} KiB -> {worker['last_kb']:.1f} KiB "
+              f"over {worker['events']} events", file=output)
+    divergences = results["divergences"]
+    print(f"{len(divergences)} diverging checkpoints", file=output)
+    for divergence in divergences[:MAX_REPORTED_DIVERGENCES]:
+        print(f"  {divergence['trace']} event {divergence['event']}: replayed {divergence['display']}", file=output)
+
+
+def parse_args(argv=None):
+    """
+    Parses the command-line arguments of the replayer.
+    """
+    parser = argparse.ArgumentParser(description="Replay recorded calculator sessions headlessly.")
+    parser.add_argument("paths", nargs="+", help="trace files or directories of .trace files")
+    parser.add_argument("-p", "--processes", type=int, help="number of worker processes (default: CPU count)")
+    parser.add_argument("--memory", action="store_true", help="track the memory growth of the workers (slows the replay)")
+    parser.add_argument("-o", "--output", help="file to write the results to, as JSON")
+    return parser.parse_args(argv)
+
+
+def main(argv=None):
+    """
+    Runs the replay; returns 1 if any checkpoint diverged, 0 otherwise.
+    """
+    args = parse_args(argv)
+    results = run_replay(find_traces(args.paths), args.processes, args.memory)
+    print_report(results)
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as file:
+            json.dump(results, file, indent=2)
+    return 1 if results["divergences"] else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,273 @@
+"""
+Evaluation daemon for the calculator: a headless asyncio server that loads
+the evaluator once and answers newline-delimited JSON requests over a Unix
+domain socket, with the calculator's semantics ("=" rounding and error
+message, "x²", "√x").
+
+Request:  {"id": 1, "op": "evaluate", "expression": "12+3*4"}
+Response: {"id": 1, "result": "24", "elapsed_us": 3.1, "latency_us": 45.0}
+
+op is "evaluate", "square" or "sqrt"; a failed calculation returns
+ERROR_MESSAGE as its result, like the calculator displays it. A malformed
+request gets {"id": ..., "error": "..."} instead. elapsed_us is the time
+spent calculating, latency_us the time from reading the request to its result.
+Requests of all connections are batched, and each connection can only have
+a bounded number of requests pending before the server stops reading it.
+
+Usage:
+    python src/server.py [--socket PATH] [--max-batch N] [--max-pending N]
+"""
+import argparse
+import asyncio
+import errno
+import json
+import os
+import stat
+import sys
+import tempfile
+import time
+from concurrent.futures import ThreadPoolExecutor
+from background import DEFAULT_MAX_INPUT_LENGTH
+from engine import CalculatorEngine
+from evaluator import ERROR_MESSAGE
+
+# Default path of the Unix domain socket
+DEFAULT_SOCKET_PATH = os.path.join(tempfile.gettempdir(), "calculator.sock")
+
+# Largest number of requests calculated in one batch
+DEFAULT_MAX_BATCH = 256
+
+# Requests a connection can have pending before the server stops reading it
+DEFAULT_MAX_PENDING = 64
+
+# Operations a request can ask for
+OPERATIONS = ("evaluate", "square", "sqrt")
+
+
+class EvaluationServer:
+    """
+    The EvaluationServer class serves the calculator's operations.
+    Requests are parsed on the event loop and queued; one batcher task
+    calculates everything queued so far in a single worker thread call,
+    so the event loop keeps reading and writing while a batch runs.
+    """
+
+    def __init__(self, max_batch=DEFAULT_MAX_BATCH, max_pending=DEFAULT_MAX_PENDING, max_input_length=DEFAULT_MAX_INPUT_LENGTH):
+        """
+        Creates the engine whose evaluator is shared by all requests.
+        """
+        self.engine = CalculatorEngine()
+        self.max_batch = max_batch
+        self.max_pending = max_pending
+        self.max_input_length = max_input_length
+        # The evaluator is not thread-safe, so batches run one at a time in one thread
+        self.executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="calculator")
+        self.queue = None
+
+    def calculate(self, operation, expression):
+        """
+        Returns the display text of an operation, or ERROR_MESSAGE if it failed.
+        """
+        if operation == "evaluate":
+            return self.engine.evaluator.calculate(expression)
+        if operation == "square":
+            result = self.engine.square_result(expression)
+        else:
+            result = self.engine.sqrt_result(expression)
+        return ERROR_MESSAGE if result is None else result
+
+    def calculate_batch(self, requests):
+        """
+        Calculates a batch of (id, operation, expression) requests
+        and returns their (id, result, elapsed seconds) triples.
+        """
+        clock = time.perf_counter
+        results = []
+        for request_id, operation, expression in requests:
+            start = clock()
+            result = self.calculate(operation, expression)
+            results.append((request_id, result, clock() - start))
+        return results
+
+    def parse_request(self, line):
+        """
+        Returns the (id, operation, expression) of a request line.
+        Raises ValueError with a message for the client if the request is malformed.
+        """
+        try:
+            request = json.loads(line)
+        except ValueError:
+            raise ValueError("Invalid JSON") from None
+        if not isinstance(request, dict):
+            raise ValueError("Request must be a JSON object")
+        request_id = request.get("id")
+        operation = request.get("op", "evaluate")
+        expression = request.get("expression")
+        if operation not in OPERATIONS:
+            raise ValueError(f"Unknown op: {operation!r}")
+        if not isinstance(expression, str):
+            raise ValueError("expression must be a string")
+        if len(expression) > self.max_input_length:
+            raise ValueError("expression is too long")
+        return request_id, operation, expression
+
+    def submit(self, line):
+        """
+        Queues a request line and returns a future of its response.
+        """
+        future = asyncio.get_running_loop().create_future()
+        try:
+            request = self.parse_request(line)
+        except ValueError as e:
+            request_id = None
+            try:
+                request_id = json.loads(line).get("id")
+            except (ValueError, AttributeError):
+                pass
+            future.set_result({"id": request_id, "error": str(e)})
+            return future
+        self.queue.put_nowait((request, time.perf_counter(), future))
+        return future
+
+    async def run_batches(self):
+        """
+        Calculates the queued requests in batches of up to max_batch, forever.
+        """
+        loop = asyncio.get_running_loop()
+        queue = self.queue
+        while True:
+            batch = [await queue.get()]
+            while len(batch) < self.max_batch and not queue.empty():
+                batch.append(queue.get_nowait())
+
+            results = await loop.run_in_executor(self.executor, self.calculate_batch, [request for request, _, _ in batch])
+            now = time.perf_counter()
+            for (_, received, future), (request_id, result, elapsed) in zip(batch, results):
+                if not future.done():
+                    future.set_result({"id": request_id, "result": result, "elapsed_us": elapsed * 1e6, "latency_us": (now - received) * 1e6})
+
+    async def handle_connection(self, reader, writer):
+        """
+        Reads the requests of one connection and writes their responses in request order.
+        Reading stops while max_pending responses are waiting to be written.
+        """
+        pending = asyncio.Queue(maxsize=self.max_pending)
+        responder = asyncio.create_task(self.write_responses(pending, writer))
+        try:
+            while True:
+                try:
+                    line = await reader.readline()
+                except ValueError:
+                    # The line is longer than the stream limit
+                    await pending.put(self.error_future("Request is too long"))
+                    break
+                if not line:
+                    break
+                if line.strip():
+                    await pending.put(self.submit(line))
+        except ConnectionError:
+            pass
+        finally:
+            await pending.put(None)
+            await responder
+            writer.close()
+
+    @staticmethod
+    def error_future(message):
+        """
+        Returns a future already holding an error response.
+        """
+        future = asyncio.get_running_loop().create_future()
+        future.set_result({"id": None, "error": message})
+        return future
+
+    @staticmethod
+    async def write_responses(pending, writer):
+        """
+        Writes the responses of the pending futures, in order, until None is queued.
+        """
+        while True:
+            future = await pending.get()
+            if future is None:
+                return
+            response = await future
+            try:
+                writer.write(json.dumps(response).encode("utf-8") + b"\n")
+                await writer.drain()
+            except ConnectionError:
+                # The client is gone; keep consuming so the reader is not blocked
+                continue
+
+    @staticmethod
+    async def remove_stale_socket(path):
+        """
+        Removes the socket file at path left behind by a server that stopped.
+        Raises OSError if path is not a socket or a server still accepts connections on it.
+        """
+        try:
+            mode = os.stat(path).st_mode
+        except FileNotFoundError:
+            return
+        if not stat.S_ISSOCK(mode):
+            raise FileExistsError(errno.EEXIST, "Not a socket", path)
+        try:
+            _, writer = await asyncio.open_unix_connection(path)
+        except ConnectionRefusedError:
+            os.unlink(path)
+            return
+        writer.close()
+        await writer.wait_closed()
+        raise OSError(errno.EADDRINUSE, "Another server is listening", path)
+
+    async def serve(self, path=DEFAULT_SOCKET_PATH):
+        """
+        Listens on the Unix domain socket at path until cancelled.
+        Raises OSError if path is in use (see remove_stale_socket()).
+        """
+        await self.remove_stale_socket(path)
+        self.queue = asyncio.Queue()
+        # Load the lazily imported interpreter now rather than on the first request
+        self.engine.evaluator.interpreter
+        # Allow a full-length expression in the JSON line
+        limit = self.max_input_length * 2 + 1024
+        server = await asyncio.start_unix_server(self.handle_connection, path, limit=limit)
+        batcher = asyncio.create_task(self.run_batches())
+        print(f"Listening on {path}", file=sys.stderr)
+        try:
+            async with server:
+                await server.serve_forever()
+        finally:
+            batcher.cancel()
+            self.executor.shutdown(wait=False)
+            if os.path.exists(path):
+                os.unlink(path)
+
+
+def parse_args(argv=None):
+    """
+    Parses the command-line arguments of the evaluation daemon.
+    """
+    parser = argparse.ArgumentParser(description="Serve the calculator's evaluation over a Unix domain socket.")
+    parser.add_argument("-s", "--socket", default=DEFAULT_SOCKET_PATH, help="path of the Unix domain socket")
+    parser.add_argument("--max-batch", type=int, default=DEFAULT_MAX_BATCH, help="largest number of requests calculated at once")
+    parser.add_argument("--max-pending", type=int, default=DEFAULT_MAX_PENDING, help="pending requests per connection before reading pauses")
+    parser.add_argument("--max-input-length", type=int, default=DEFAULT_MAX_INPUT_LENGTH, help="longest expression accepted, in characters")
+    return parser.parse_args(argv)
+
+
+def main(argv=None):
+    """
+    Runs the evaluation daemon until interrupted.
+    """
+    args = parse_args(argv)
+    server = EvaluationServer(args.max_batch, args.max_pending, args.max_input_length)
+    try:
+        asyncio.run(server.serve(args.socket))
+    except KeyboardInterrupt:
+        pass
+    except OSError as e:
+        sys.exit(f"Cannot serve: {e}")
+
+
+if __name__ == "__main__":
+    main()
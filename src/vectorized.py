@@ -0,0 +1,514 @@
+"""
+Vectorized mode for the calculator: evaluates one expression template
+with named operands (e.g. "A * 1.2 + B", "sqrt(A) + square(B)")
+over whole NumPy arrays or CSV columns read in chunks.
+Rows that fail (division by zero, square root of a negative number,
+overflow when squaring, non-numeric input) are masked and displayed
+as ERROR_MESSAGE, like the calculator does for a single expression.
+As in the calculator, results of integers combined with + - * and
+square() are exact integers, shown without a fractional part. Values are
+computed in double precision; the few rows where an integer too large
+for a double takes part are calculated again with Python numbers.
+
+Usage:
+    python src/vectorized.py TEMPLATE [INPUT.csv] [--output OUTPUT] [--chunk-size N]
+"""
+import argparse
+import ast
+import csv
+import operator
+import sys
+import time
+from collections import namedtuple
+from itertools import islice
+import numpy as np
+from evaluator import ERROR_MESSAGE
+
+# Number of CSV rows converted to arrays at once
+DEFAULT_CHUNK_SIZE = 100000
+
+# Magnitude from which consecutive doubles are more than 1e-12 apart,
+# so round(value, 12) returns the value unchanged
+ROUNDING_LIMIT = 2.0**13
+
+# Magnitude from which a double no longer holds every integer
+EXACT_LIMIT = 2.0**53
+
+# Bytes of a numeric CSV cell that make it a float literal rather than an integer
+FLOAT_BYTES = np.zeros(256, dtype=bool)
+FLOAT_BYTES[list(b".eEiInN")] = True
+
+
+def square(values):
+    """
+    Vectorized "x²": rows whose square overflows are errors.
+    """
+    result = np.square(values)
+    return result, np.isinf(result) & np.isfinite(values)
+
+
+def sqrt(values):
+    """
+    Vectorized "√x": rows with a negative value are errors.
+    """
+    errors = values < 0
+    return np.sqrt(np.where(errors, 0.0, values)), errors
+
+
+def beyond_double(values, integral):
+    """
+    Returns the mask of the integral rows too large to be exact as doubles.
+    """
+    return np.logical_and(integral, np.abs(values) >= EXACT_LIMIT)
+
+
+def divide(left, right):
+    """
+    Vectorized "÷": rows divided by zero are errors.
+    """
+    errors = right == 0
+    return np.true_divide(left, np.where(errors, 1.0, right)), errors
+
+
+# Calculator operations available as functions in a template
+FUNCTIONS = {
+    "square": square,
+    "sqr": square,
+    "sqrt": sqrt,
+}
+
+# Binary operators of a template; only "/" can produce errors
+BINARY_OPERATORS = {
+    ast.Add: np.add,
+    ast.Sub: np.subtract,
+    ast.Mult: np.multiply,
+}
+
+UNARY_OPERATORS = {
+    ast.UAdd: np.positive,
+    ast.USub: np.negative,
+}
+
+# The same operators on Python numbers, for rows calculated one by one
+ROW_OPERATORS = {
+    ast.Add: operator.add,
+    ast.Sub: operator.sub,
+    ast.Mult: operator.mul,
+    ast.Div: operator.truediv,
+    ast.UAdd: operator.pos,
+    ast.USub: operator.neg,
+}
+
+# Results of a chunk: the values rounded to 12 digits as a masked array (masked
+# rows are errors), the mask of the rows holding integers below EXACT_LIMIT,
+# and the larger integer results by row
+ColumnResults = namedtuple("ColumnResults", ("values", "integral", "integers"))
+
+
+def round_values(values):
+    """
+    Rounds values to 12 decimal places exactly as round(value, 12) does.
+    """
+    small = np.abs(values) < ROUNDING_LIMIT
+    scaled = np.where(small, values, 0.0) * 1e12
+    nearest = np.rint(scaled)
+    rounded = np.where(small, nearest / 1e12, values)
+    # Scaling is exact except when it lands on a tie, which rint() breaks to even
+    # whichever side the exact product is on; those rows are left to round()
+    ties = small & (np.abs(scaled - nearest) == 0.5)
+    if ties.any():
+        rounded[ties] = [round(value, 12) for value in values[ties].tolist()]
+    return rounded
+
+
+def combine_errors(*errors):
+    """
+    Returns the union of the error masks, ignoring missing ones.
+    """
+    result = None
+    for mask in errors:
+        if mask is None:
+            continue
+        result = mask if result is None else result | mask
+    return result
+
+
+class ColumnExpression:
+    """
+    The ColumnExpression class compiles an expression template once
+    and evaluates it over columns of data with NumPy ufuncs.
+    Alongside the values it tracks which rows hold integers, the way
+    Python (and so the calculator) keeps int results apart from floats.
+    """
+
+    def __init__(self, template):
+        """
+        Parses the template and builds the vectorized evaluation.
+        Raises ValueError if the template uses anything other than numbers,
+        names, + - * /, parentheses, square() and sqrt().
+        """
+        self.template = template
+        self.names = []
+        try:
+            self.tree = ast.parse(template, mode="eval").body
+        except SyntaxError as e:
+            raise ValueError(f"Invalid template: {template}") from e
+        self.calculate = self.compile(self.tree)
+
+    def compile(self, node):
+        """
+        Turns an AST node into a function of the columns returning
+        a (values, errors, integral, inexact) tuple, where inexact marks
+        the rows where an integer beyond EXACT_LIMIT took part;
+        columns map each name to a (values, integral) pair.
+        """
+        if isinstance(node, ast.Constant) and type(node.value) in (int, float):
+            try:
+                value = float(node.value)
+            except OverflowError as e:
+                raise ValueError(f"Number too large in template: {self.template}") from e
+            integral = type(node.value) is int
+            inexact = integral and abs(node.value) >= EXACT_LIMIT
+            return lambda columns: (value, None, integral, inexact)
+
+        if isinstance(node, ast.Name):
+            name = node.id
+            if name not in self.names:
+                self.names.append(name)
+
+            def calculate_name(columns):
+                values, integral = columns[name]
+                return values, None, integral, beyond_double(values, integral)
+            return calculate_name
+
+        if isinstance(node, ast.UnaryOp) and type(node.op) in UNARY_OPERATORS:
+            ufunc = UNARY_OPERATORS[type(node.op)]
+            operand = self.compile(node.operand)
+
+            def calculate_unary(columns):
+                values, errors, integral, inexact = operand(columns)
+                return ufunc(values), errors, integral, inexact
+            return calculate_unary
+
+        if isinstance(node, ast.BinOp) and (type(node.op) in BINARY_OPERATORS or isinstance(node.op, ast.Div)):
+            left = self.compile(node.left)
+            right = self.compile(node.right)
+            if isinstance(node.op, ast.Div):
+                def calculate_binary(columns):
+                    left_values, left_errors, _, left_inexact = left(columns)
+                    right_values, right_errors, _, right_inexact = right(columns)
+                    values, errors = divide(left_values, right_values)
+                    return values, combine_errors(left_errors, right_errors, errors), False, \
+                        np.logical_or(left_inexact, right_inexact)
+            else:
+                ufunc = BINARY_OPERATORS[type(node.op)]
+
+                def calculate_binary(columns):
+                    left_values, left_errors, left_integral, left_inexact = left(columns)
+                    right_values, right_errors, right_integral, right_inexact = right(columns)
+                    values = ufunc(left_values, right_values)
+                    integral = np.logical_and(left_integral, right_integral)
+                    inexact = left_inexact | right_inexact | beyond_double(values, integral)
+                    return values, combine_errors(left_errors, right_errors), integral, inexact
+            return calculate_binary
+
+        if isinstance(node, ast.Call) and isinstance(node.func, ast.Name) and node.func.id in FUNCTIONS \
+                and len(node.args) == 1 and not node.keywords:
+            function = FUNCTIONS[node.func.id]
+            argument = self.compile(node.args[0])
+
+            def calculate_call(columns):
+                values, errors, integral, inexact = argument(columns)
+                values, function_errors = function(np.asarray(values, dtype=float))
+                if function is not square:
+                    integral = False
+                return values, combine_errors(errors, function_errors), integral, inexact | beyond_double(values, integral)
+            return calculate_call
+
+        raise ValueError(f"Unsupported element in template: {ast.dump(node)}")
+
+    def calculate_row(self, node, values):
+        """
+        Calculates the template with Python numbers, the way the calculator does,
+        for one row given as a mapping of name -> int or float.
+        Raises ArithmeticError or ValueError if the row is an error.
+        """
+        if isinstance(node, ast.Constant):
+            return node.value
+        if isinstance(node, ast.Name):
+            return values[node.id]
+        if isinstance(node, ast.UnaryOp):
+            return ROW_OPERATORS[type(node.op)](self.calculate_row(node.operand, values))
+        if isinstance(node, ast.BinOp):
+            return ROW_OPERATORS[type(node.op)](self.calculate_row(node.left, values), self.calculate_row(node.right, values))
+
+        value = self.calculate_row(node.args[0], values)
+        if FUNCTIONS[node.func.id] is square:
+            return value**2
+        if value < 0:
+            raise ValueError("Square root of a negative number")
+        return value**0.5
+
+    def evaluate(self, columns, length=None, integral=None, sources=None):
+        """
+        Evaluates the template over a mapping of name -> array and returns ColumnResults.
+        Columns with an integer dtype hold integers; integral optionally maps
+        names to masks of the rows holding integers (e.g. for columns read as text).
+        sources optionally maps names to the exact values (numbers or their text)
+        of the columns by row, used for the rows too large to be exact as doubles.
+        length is only needed when the template has no names.
+        """
+        integral = integral or {}
+        sources = sources or columns
+        arrays = {}
+        for name in self.names:
+            values = np.asarray(columns[name])
+            row_integral = integral.get(name)
+            if row_integral is None:
+                row_integral = values.dtype.kind in "iu"
+            arrays[name] = (values.astype(float, copy=False), np.broadcast_to(row_integral, values.shape))
+        if length is None:
+            length = len(arrays[self.names[0]][0]) if self.names else 1
+
+        with np.errstate(all="ignore"):
+            values, errors, row_integral, inexact = self.calculate(arrays)
+            values = round_values(np.broadcast_to(values, (length,)))
+        errors = np.zeros(length, dtype=bool) if errors is None else np.broadcast_to(errors, (length,)).copy()
+        row_integral = np.broadcast_to(row_integral, (length,)) & np.isfinite(values)
+
+        integers = {}
+        for row in np.flatnonzero(np.broadcast_to(inexact, (length,))).tolist():
+            try:
+                row_values = {name: int(sources[name][row]) if arrays[name][1][row] else float(sources[name][row])
+                              for name in self.names}
+                value = self.calculate_row(self.tree, row_values)
+            except (ArithmeticError, ValueError):
+                errors[row] = True
+                continue
+            errors[row] = False
+            row_integral[row] = False
+            if type(value) is int:
+                integers[row] = value
+            else:
+                values[row] = round(value, 12)
+        return ColumnResults(np.ma.masked_array(values, mask=errors), row_integral, integers)
+
+
+def format_results(results):
+    """
+    Returns the display text of each row of ColumnResults: the rounded value,
+    without a fractional part for integers, or ERROR_MESSAGE.
+    Each kind of row is converted in one batch rather than row by row.
+    """
+    values = results.values.data
+    errors = np.ma.getmaskarray(results.values)
+    integral = results.integral & ~errors
+    texts = np.full(len(values), ERROR_MESSAGE, dtype=object)
+
+    texts[integral] = list(map(str, values[integral].astype(np.int64).tolist()))
+    floats = ~(integral | errors)
+    texts[floats] = list(map(repr, values[floats].tolist()))
+    for row, value in results.integers.items():
+        texts[row] = str(value)
+    return texts.tolist()
+
+
+def is_integer_literal(cell):
+    """
+    Checks if a CSV cell holds an integer, as opposed to a float.
+    """
+    try:
+        int(cell)
+    except ValueError:
+        return False
+    return True
+
+
+def is_named_number(cell):
+    """
+    Checks if a CSV cell holds inf or nan, which float() accepts
+    but the calculator cannot take as input.
+    """
+    return cell.strip().lstrip("+-")[:1] in ("i", "I", "n", "N")
+
+
+def to_column(cells):
+    """
+    Converts a list of CSV cells to a float array, a mask of non-numeric cells
+    and a mask of the cells holding integers.
+    """
+    integral = np.array([is_integer_literal(cell) for cell in cells], dtype=bool)
+    errors = np.zeros(len(cells), dtype=bool)
+    try:
+        values = np.array(cells, dtype=float)
+    except ValueError:
+        values = np.empty(len(cells))
+        for index, cell in enumerate(cells):
+            try:
+                values[index] = float(cell)
+            except ValueError:
+                values[index] = 0.0
+                errors[index] = True
+    for index in np.flatnonzero(~np.isfinite(values)).tolist():
+        errors[index] = is_named_number(cells[index])
+    return values, errors, integral
+
+
+class LineCells:
+    """
+    The LineCells class gives the cells of one column of CSV lines by row,
+    splitting a line only when its cell is asked for.
+    """
+
+    def __init__(self, lines, index):
+        """
+        Gives the cells at index of the lines.
+        """
+        self.lines = lines
+        self.index = index
+
+    def __getitem__(self, row):
+        """
+        Returns the cell of the given row.
+        """
+        return self.lines[row].rstrip("\r\n").split(",")[self.index]
+
+
+def parse_numeric_lines(lines, indexes):
+    """
+    Parses a chunk of CSV lines holding only plain numbers, entirely in NumPy.
+    Returns None if the chunk needs the csv module (quotes, blank or ragged
+    lines, non-numeric cells), otherwise the same as parse_rows().
+    """
+    block = "".join(lines)
+    if not block.endswith("\n"):
+        block += "\n"
+    if '"' in block or block.count("\n") != len(lines):
+        return None
+    try:
+        values = np.loadtxt(lines, delimiter=",", usecols=indexes, dtype=float, ndmin=2, comments=None)
+    except ValueError:
+        return None
+    if len(values) != len(lines):
+        return None
+
+    # Every line must have as many cells as the first one, so that the n-th cell
+    # of the chunk is cell n % field_count of line n // field_count
+    data = np.frombuffer(block.encode("utf-8"), dtype=np.uint8)
+    field_count = lines[0].count(",") + 1
+    separators = (data == ord(",")) | (data == ord("\n"))
+    cells = np.cumsum(separators, dtype=np.int64)
+    if np.any(np.diff(cells[data == ord("\n")], prepend=0) != field_count):
+        return None
+
+    float_cells = cells[FLOAT_BYTES[data]]
+    float_rows, float_fields = np.divmod(float_cells, field_count)
+    integral = []
+    sources = [LineCells(lines, index) for index in indexes]
+    input_errors = np.zeros(len(lines), dtype=bool)
+    for column, index in enumerate(indexes):
+        mask = np.ones(len(lines), dtype=bool)
+        mask[float_rows[float_fields == index]] = False
+        integral.append(mask)
+        for row in np.flatnonzero(~np.isfinite(values[:, column])).tolist():
+            input_errors[row] |= is_named_number(sources[column][row])
+    return values.T, integral, sources, input_errors
+
+
+def parse_rows(lines, indexes):
+    """
+    Parses a chunk of CSV lines with the csv module: returns the float columns
+    at indexes, their masks of cells holding integers, their cells by row,
+    and a mask of the rows with a missing or non-numeric cell.
+    """
+    rows = list(csv.reader(lines))
+    columns = []
+    integral = []
+    sources = []
+    input_errors = np.zeros(len(rows), dtype=bool)
+    for index in indexes:
+        cells = [row[index] if index < len(row) else "" for row in rows]
+        values, errors, column_integral = to_column(cells)
+        columns.append(values)
+        integral.append(column_integral)
+        sources.append(cells)
+        input_errors |= errors
+    return columns, integral, sources, input_errors
+
+
+def evaluate_csv(expression, input_stream, chunk_size=DEFAULT_CHUNK_SIZE):
+    """
+    Reads a CSV stream with a header row in chunks and yields
+    the ColumnResults of the expression for each chunk.
+    Chunks of plain numbers are parsed with NumPy, others with the csv module.
+    """
+    header = next(csv.reader([input_stream.readline()]), None)
+    if not header:
+        return
+    missing = [name for name in expression.names if name not in header]
+    if missing:
+        raise ValueError(f"Columns not found in CSV header: {', '.join(missing)}")
+    indexes = [header.index(name) for name in expression.names]
+
+    while True:
+        lines = list(islice(input_stream, chunk_size))
+        if not lines:
+            return
+        # A quoted cell can span lines: the chunk must end with a complete row
+        if "".join(lines).count('"') % 2:
+            for line in input_stream:
+                lines.append(line)
+                if "".join(lines).count('"') % 2 == 0:
+                    break
+        parsed = parse_numeric_lines(lines, indexes) if indexes else None
+        columns, integral, sources, input_errors = parsed or parse_rows(lines, indexes)
+        names = expression.names
+        # Rows with an invalid cell are errors whatever their other cells give
+        results = expression.evaluate(dict(zip(names, columns)), len(input_errors), dict(zip(names, integral)),
+                                      dict(zip(names, sources)))
+        results.values[input_errors] = np.ma.masked
+        for row in np.flatnonzero(input_errors).tolist():
+            results.integers.pop(row, None)
+        yield results
+
+
+def parse_args(argv=None):
+    """
+    Parses the command-line arguments of the vectorized mode.
+    """
+    parser = argparse.ArgumentParser(description="Evaluate an expression template over CSV columns.")
+    parser.add_argument("template", help='expression with column names, e.g. "A * 1.2 + B" or "sqrt(A)"')
+    parser.add_argument("input", nargs="?", default="-", help="CSV file with a header row (default: stdin)")
+    parser.add_argument("-o", "--output", default="-", help="file to write the results to (default: stdout)")
+    parser.add_argument("-c", "--chunk-size", type=int, default=DEFAULT_CHUNK_SIZE, help="rows evaluated at once")
+    return parser.parse_args(argv)
+
+
+def main(argv=None):
+    """
+    Runs the vectorized mode and reports the throughput on stderr.
+    """
+    args = parse_args(argv)
+    expression = ColumnExpression(args.template)
+    input_stream = sys.stdin if args.input == "-" else open(args.input, newline="", encoding="utf-8")
+    output_stream = sys.stdout if args.output == "-" else open(args.output, "w", encoding="utf-8")
+
+    row_count = 0
+    try:
+        start = time.perf_counter()
+        for results in evaluate_csv(expression, input_stream, args.chunk_size):
+            output_stream.write("\n".join(format_results(results)) + "\n")
+            row_count += len(results.values)
+        elapsed = time.perf_counter() - start
+    finally:
+        if input_stream is not sys.stdin:
+            input_stream.close()
+        if output_stream is not sys.stdout:
+            output_stream.close()
+
+    rate = row_count / elapsed if elapsed > 0 else 0.0
+    print(f"{row_count} rows in {elapsed:.3f} s ({rate:,.0f} rows/sec)", file=sys.stderr)
+
+
+if __name__ == "__main__":
+    main()
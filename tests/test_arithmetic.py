@@ -0,0 +1,80 @@
+import random
+import pytest
+from arithmetic import ArithmeticSyntaxError, parse, run
+
+asteval = pytest.importorskip("asteval")
+
+
+def reference(interpreter, expression):
+    """
+    Returns the asteval result of the expression, or the type of the error it raises.
+    """
+    interpreter.error = []
+    try:
+        return interpreter.eval(expression, show_errors=False, raise_errors=True)
+    except Exception as error:
+        return type(error)
+
+
+def fast(expression):
+    """
+    Returns the fast path result of the expression, the type of the error it raises,
+    or None if the fast path leaves the expression to asteval.
+    """
+    try:
+        program = parse(expression)
+    except ArithmeticSyntaxError:
+        return None
+    try:
+        return run(program)
+    except Exception as error:
+        return type(error)
+
+
+def random_number(rng):
+    text = rng.choice(["0", str(rng.randint(1, 10**rng.randint(1, 20))), f"{rng.uniform(0, 1000):.{rng.randint(0, 6)}f}"])
+    if rng.random() < 0.1:
+        text += f"e{rng.choice(['', '-', '+'])}{rng.randint(0, 400)}"
+    return text
+
+
+def random_expression(rng):
+    parts = [rng.choice(["", "-", "+", "--"]) + random_number(rng)]
+    for _ in range(rng.randint(0, 8)):
+        parts.append(rng.choice(["+", "-", "*", "/", "*-", " / ", "\t+"]))
+        parts.append(random_number(rng))
+    return "".join(parts)
+
+
+def assert_same(interpreter, expression):
+    result = fast(expression)
+    if result is None:
+        return
+    expected = reference(interpreter, expression)
+    assert type(result) is type(expected) and repr(result) == repr(expected), expression
+
+
+@pytest.fixture(scope="module")
+def interpreter():
+    return asteval.Interpreter()
+
+
+def test_calculator_expressions_match_asteval(interpreter):
+    rng = random.Random(2024)
+    for _ in range(3000):
+        expression = random_expression(rng)
+        assert fast(expression) is not None, expression
+        assert_same(interpreter, expression)
+
+
+def test_random_text_matches_asteval(interpreter):
+    rng = random.Random(7)
+    alphabet = "0123456789.+-*/eE \t"
+    for _ in range(5000):
+        # The evaluator strips the expression before parsing it
+        assert_same(interpreter, "".join(rng.choice(alphabet) for _ in range(rng.randint(1, 12))).strip())
+
+
+@pytest.mark.parametrize("expression", ["٣+1", "1+²", "2 +3", "2\n+3", "2+3 ", "1 2", "2**3", "(1+2)"])
+def test_text_outside_grammar_is_left_to_asteval(expression):
+    assert fast(expression) is None
@@ -0,0 +1,125 @@
+import multiprocessing
+import time
+import pytest
+from background import BackgroundEvaluator
+from engine import CalculatorEngine
+
+
+class Window:
+    """
+    Stand-in for the Tk window: runs the after() callbacks in run_until_idle().
+    """
+
+    def __init__(self):
+        self.pending = []
+
+    def after(self, delay, function, *args):
+        self.pending.append((function, args))
+
+    def run_until_idle(self, limit=10.0):
+        deadline = time.monotonic() + limit
+        while self.pending and time.monotonic() < deadline:
+            function, args = self.pending.pop(0)
+            time.sleep(0.001)
+            function(*args)
+        assert not self.pending
+
+
+def pause(text):
+    """
+    Sleeps for text seconds and returns text.
+    """
+    time.sleep(float(text))
+    return text
+
+
+def worker_pid(text):
+    """
+    Returns the pid of the process running the computation.
+    """
+    return multiprocessing.current_process().pid
+
+
+@pytest.fixture(params=[False, True], ids=["thread", "process"])
+def worker(request):
+    window = Window()
+    background = BackgroundEvaluator(window, timeout=1.0, max_input_length=10, in_process=request.param)
+    yield window, background
+    background.shutdown()
+
+
+def test_result_is_reported(worker):
+    window, background = worker
+    results = []
+    background.submit(pause, "0.01", results.append)
+    assert background.busy
+    window.run_until_idle()
+    assert results == ["0.01"] and not background.busy
+
+
+def test_failure_reports_none(worker):
+    window, background = worker
+    results = []
+    background.submit(pause, "x", results.append)
+    window.run_until_idle()
+    assert results == [None]
+
+
+def test_argument_over_size_budget_is_not_computed(worker):
+    window, background = worker
+    results = []
+    background.submit(pause, "0." + "0" * 10, results.append)
+    assert results == [None] and not background.busy and not window.pending
+
+
+def test_timeout_reports_none(worker):
+    window, background = worker
+    background.timeout = 0.05
+    results = []
+    start = time.monotonic()
+    background.submit(pause, "5", results.append)
+    window.run_until_idle()
+    assert results == [None] and not background.busy
+    assert time.monotonic() - start < 1.0
+
+
+def test_cancelled_result_is_dropped(worker):
+    window, background = worker
+    results = []
+    background.submit(pause, "0.2", results.append)
+    background.cancel()
+    assert not background.busy
+    background.submit(pause, "0.01", results.append)
+    window.run_until_idle()
+    assert results == ["0.01"]
+
+
+def test_cancel_stops_worker_process():
+    window = Window()
+    background = BackgroundEvaluator(window, in_process=True)
+    pids = []
+    background.submit(worker_pid, "", pids.append)
+    window.run_until_idle()
+    process = next(process for process in multiprocessing.active_children() if process.pid == pids[0])
+
+    background.submit(pause, "30", pids.append)
+    background.cancel()
+    process.join(1.0)
+    assert not process.is_alive()
+
+    background.submit(worker_pid, "", pids.append)
+    window.run_until_idle()
+    assert len(pids) == 2 and pids[1] != pids[0]
+    background.shutdown()
+
+
+def test_exact_operation_runs_in_process():
+    window = Window()
+    background = BackgroundEvaluator(window, in_process=True)
+    engine = CalculatorEngine(exact_mode=True)
+    engine.feed("0.1+0.2")
+    function, argument = engine.start_operation("evaluate")
+    background.submit(function, argument, lambda result: engine.finish_operation("evaluate", result))
+    window.run_until_idle()
+    assert engine.current_expression == "0.3"
+    background.shutdown()
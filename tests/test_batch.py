@@ -0,0 +1,12 @@
+import io
+from batch import run_batch
+from evaluator import Evaluator
+
+
+def test_results_keep_input_order_across_chunks():
+    expressions = [f"{number}*3+{number % 7}" if number % 5 else f"{number}/0" for number in range(200)]
+    output = io.StringIO()
+    assert run_batch(io.StringIO("".join(f"{expression}\n" for expression in expressions)), output,
+                     processes=2, chunk_size=7) == 200
+    evaluator = Evaluator()
+    assert output.getvalue().splitlines() == [evaluator.calculate(expression) for expression in expressions]
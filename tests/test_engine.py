@@ -0,0 +1,73 @@
+import random
+import time
+import pytest
+import exact
+from engine import CalculatorEngine
+
+# Keys of the random sessions, digits being the most frequent
+SESSION_KEYS = "0123456789" * 3 + "00.." + "+-*/" * 2 + "=²√" + "\b\x1b"
+
+
+def random_session(rng, length):
+    return "".join(rng.choice(SESSION_KEYS) for _ in range(length))
+
+
+def test_exact_operation_after_error_keeps_error():
+    engine = CalculatorEngine(exact_mode=True)
+    _, shown = engine.feed("9" * 12 + "²" * 30)
+    assert shown.startswith("ERROR")
+    assert engine.feed("√") == ("", shown)
+
+
+def test_exact_squaring_stops_at_max_bits():
+    engine = CalculatorEngine(exact_mode=True)
+    _, shown = engine.feed("3" + "²" * 15)
+    assert shown == "2.03833073902e+15634"
+    assert engine.feed("²")[1].startswith("ERROR")
+
+    # The largest kept fraction still squares quickly
+    half = exact.MAX_BITS // 2
+    value = exact.Fraction((1 << half) - 1, (1 << half) - 3)
+    start = time.perf_counter()
+    exact.square(value)
+    assert time.perf_counter() - start < 0.5
+
+
+@pytest.mark.parametrize("exact_mode", [False, True])
+def test_preview_matches_evaluated_result(exact_mode):
+    rng = random.Random(12)
+    compared = 0
+    for index in range(1500):
+        session = random_session(rng, rng.randint(1, 14) if index % 50 else 2000)
+        engine = CalculatorEngine(exact_mode=exact_mode)
+        engine.feed(session)
+        preview = engine.preview
+        # After an operator the preview shows the committed part, which "=" rejects
+        if preview and engine.current_expression:
+            assert engine.feed("=")[1] == preview, session
+            compared += 1
+    assert compared > 300
+
+
+@pytest.mark.parametrize("exact_mode", [False, True])
+def test_paste_matches_typing_the_same_keys(exact_mode):
+    rng = random.Random(11)
+    for _ in range(1500):
+        prefix = random_session(rng, rng.randint(0, 8))
+        text = "".join(rng.choice("0123456789" * 2 + "000...+-*/×÷ ") for _ in range(rng.randint(1, 16)))
+        pasted = CalculatorEngine(exact_mode=exact_mode)
+        pasted.feed(prefix)
+        assert pasted.paste(text)
+        typed = CalculatorEngine(exact_mode=exact_mode)
+        typed.emotion = pasted.emotion
+        typed.feed(prefix)
+        typed.feed(text.replace(" ", "").replace("×", "*").replace("÷", "/"))
+        assert (pasted.display, pasted.preview) == (typed.display, typed.preview), (prefix, text)
+        assert pasted.feed("=") == typed.feed("="), (prefix, text)
+
+
+def test_invalid_paste_changes_nothing():
+    engine = CalculatorEngine()
+    engine.feed("12+3")
+    assert not engine.paste("4+x")
+    assert engine.display == ("12+", "3")
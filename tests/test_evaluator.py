@@ -0,0 +1,45 @@
+import pytest
+from engine import CalculatorEngine
+from evaluator import Evaluator, ERROR_MESSAGE
+
+
+@pytest.fixture
+def evaluator():
+    return Evaluator()
+
+
+@pytest.mark.parametrize("expression, result", [("2+3", 5), (" 2 + 3 ", 5), ("4 * 2 - 1", 7), ("1e5", 100000.0)])
+def test_whitespace_between_tokens_is_ignored(evaluator, expression, result):
+    assert evaluator.evaluate(expression) == result
+
+
+@pytest.mark.parametrize("expression", ["1 2", "1e 5", "1 .5", "12 3+4"])
+def test_whitespace_inside_numbers_is_rejected(evaluator, expression):
+    with pytest.raises(Exception):
+        evaluator.evaluate(expression)
+
+
+def test_cached_expression_is_evaluated_again(evaluator):
+    assert evaluator.evaluate("12+3") == evaluator.evaluate(" 12+3") == 15
+    with pytest.raises(Exception):
+        evaluator.evaluate("1 2+3")
+
+
+def test_assigned_names_do_not_leak_between_evaluations(evaluator):
+    evaluator.calculate("a=5")
+    assert evaluator.calculate("a*2") == ERROR_MESSAGE
+    evaluator.calculate("abs = 3")
+    assert evaluator.calculate("abs(-2)") == "2"
+
+
+@pytest.mark.parametrize("expression, result", [("inf", "inf"), ("inf+1", "inf"), ("-inf*2", "-inf"), ("inf-inf", "nan")])
+def test_infinite_results_can_be_reused(evaluator, expression, result):
+    assert evaluator.calculate(expression) == result
+
+
+def test_overflowing_result_can_be_reused():
+    number = "1" + "0" * 200 + ".5"
+    engine = CalculatorEngine()
+    assert engine.feed(f"{number}*{number}=")[1] == "inf"
+    assert engine.feed("=")[1] == "inf"
+    assert engine.feed("+1=")[1] == "inf"
@@ -0,0 +1,32 @@
+import random
+from expression import TokenBuffer
+
+
+def test_rendering_between_changes_matches_the_tokens():
+    rng = random.Random(5)
+    buffer = TokenBuffer()
+    for _ in range(2000):
+        action = rng.random()
+        if action < 0.05:
+            buffer.clear()
+        elif buffer.ends_with("+-*/") and action < 0.3:
+            buffer.replace_operator(rng.choice("+-*/"))
+        elif buffer.ends_with("+-*/") or not buffer:
+            buffer.append_number(str(rng.randint(0, 999)), False)
+        else:
+            buffer.append_operator(rng.choice("+-*/"))
+        if rng.random() < 0.5:
+            assert buffer.render() == "".join(token.text for token in buffer.tokens)
+    assert buffer.render() == "".join(token.text for token in buffer.tokens)
+
+
+def test_replaced_operator_after_rendering():
+    buffer = TokenBuffer()
+    buffer.append_number("12")
+    buffer.append_operator("+")
+    assert buffer.render() == "12+"
+    buffer.replace_operator("*")
+    assert buffer.render() == "12*"
+    buffer.append_number("3")
+    buffer.clear()
+    assert buffer.render() == "" and not buffer
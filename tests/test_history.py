@@ -0,0 +1,95 @@
+import os
+import pytest
+from history import History, HistoryEntry, INDEX_SUFFIX, RECORD
+
+
+def entry(number):
+    return HistoryEntry(f"{number}+1", str(number + 1))
+
+
+@pytest.fixture
+def path(tmp_path):
+    """
+    Returns the path of a history log holding 100 entries.
+    """
+    path = str(tmp_path / "history")
+    history = History(path, window_size=10)
+    for number in range(100):
+        history.append(*entry(number))
+    history.close()
+    return path
+
+
+def reopen(path):
+    history = History(path, window_size=10)
+    entries = [history.entry(position) for position in range(len(history))]
+    return history, entries
+
+
+def test_entries_survive_reopening(path):
+    history, entries = reopen(path)
+    assert entries == [entry(number) for number in range(100)]
+    assert history.recent(2) == [entry(98), entry(99)]
+    history.close()
+
+
+def test_missing_index_is_rebuilt_from_log(path):
+    log_size = os.path.getsize(path)
+    os.remove(path + INDEX_SUFFIX)
+    history, entries = reopen(path)
+    assert entries == [entry(number) for number in range(100)]
+    history.close()
+    assert os.path.getsize(path) == log_size
+    assert os.path.getsize(path + INDEX_SUFFIX) == 100 * RECORD.size
+
+
+def test_empty_index_is_rebuilt_from_log(path):
+    open(path + INDEX_SUFFIX, "wb").close()
+    history, entries = reopen(path)
+    assert entries == [entry(number) for number in range(100)]
+    history.close()
+
+
+def test_torn_index_record_is_dropped_and_reindexed(path):
+    with open(path + INDEX_SUFFIX, "r+b") as file:
+        file.truncate(99 * RECORD.size + 5)
+    history, entries = reopen(path)
+    assert entries == [entry(number) for number in range(100)]
+    history.close()
+
+
+def test_torn_log_tail_is_dropped(path):
+    log_size = os.path.getsize(path)
+    with open(path, "ab") as file:
+        file.write(b"100+1\t1")
+    history, entries = reopen(path)
+    assert entries == [entry(number) for number in range(100)]
+    history.append(*entry(100))
+    history.close()
+    assert os.path.getsize(path) == log_size + len("100+1\t101\n")
+    history, entries = reopen(path)
+    assert entries[-1] == entry(100)
+    history.close()
+
+
+def test_index_record_past_log_end_is_dropped(path):
+    with open(path, "r+b") as file:
+        file.truncate(os.path.getsize(path) - 3)
+    history, entries = reopen(path)
+    assert entries == [entry(number) for number in range(99)]
+    history.close()
+
+
+def test_calculators_sharing_the_history_keep_it_consistent(path):
+    first = History(path, window_size=10)
+    second = History(path, window_size=10)
+    for number in range(100, 110):
+        (first if number % 3 else second).append(*entry(number))
+    assert first.recent(3) == [entry(107), entry(108), entry(109)]
+    assert second.recent(3) == [entry(106), entry(107), entry(108)]
+    first.close()
+    second.close()
+
+    history, entries = reopen(path)
+    assert entries == [entry(number) for number in range(110)]
+    history.close()
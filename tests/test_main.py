@@ -0,0 +1,47 @@
+import pytest
+from benchmark import install_fake_customtkinter
+from engine import CalculatorEngine
+
+install_fake_customtkinter()
+import main  # needs the customtkinter stand-in
+
+
+@pytest.mark.parametrize("exact_mode", [False, True])
+def test_keys_pressed_during_computation_are_queued(exact_mode):
+    calculator = main.Calculator(exact_mode=exact_mode)
+    bindings = calculator.window.bindings
+    for key in "12":
+        bindings[key](None)
+    calculator.square()
+    assert calculator.background.busy
+    for key in ("+", "3", "4", "<BackSpace>", "<Return>"):
+        bindings[key](None)
+    calculator.sqrt()
+    calculator.window.run_pending()
+    assert not calculator.background.busy and not calculator.queued_keys
+    assert calculator.engine.display == CalculatorEngine(exact_mode=exact_mode).feed("12²+34\b=√")
+    calculator.background.shutdown()
+
+
+def test_clear_drops_queued_keys():
+    calculator = main.Calculator()
+    bindings = calculator.window.bindings
+    bindings["9"](None)
+    calculator.square()
+    bindings["+"](None)
+    bindings["<Escape>"](None)
+    calculator.window.run_pending()
+    assert not calculator.queued_keys
+    assert calculator.engine.display == ("", "0")
+    calculator.background.shutdown()
+
+
+def test_unusable_history_file_disables_history(tmp_path, capsys):
+    calculator = main.Calculator(history_path=str(tmp_path / "missing" / "history"))
+    assert calculator.history is None
+    assert "History disabled" in capsys.readouterr().err
+    for key in ("1", "+", "2", "<Return>", "<Up>"):
+        calculator.window.bindings[key](None)
+    calculator.window.run_pending()
+    assert calculator.engine.current_expression == "3"
+    calculator.background.shutdown()
@@ -0,0 +1,96 @@
+import os
+import pytest
+from benchmark import install_fake_customtkinter
+from recorder import KEYS, TraceFormatError, TraceWriter, display_checksum, read_trace
+from replay import run_replay
+
+install_fake_customtkinter()
+import main  # needs the customtkinter stand-in
+
+
+def write_trace(path, events, **header):
+    writer = TraceWriter(str(path), header.get("emotion", "(^_^)"), header.get("exact_mode", False),
+                         header.get("max_input_length", 0))
+    for event, payload in events:
+        if event == "check":
+            writer.check(payload)
+        elif event in ("paste", "recall"):
+            writer.record_text(event, payload)
+        else:
+            writer.record(event)
+    writer.close()
+
+
+def test_events_round_trip(tmp_path):
+    display = ("12.5*3-", "37.5")
+    events = [(key, None) for key in KEYS] + [("paste", "12.5×3-"), ("recall", "42"), ("check", display)]
+    write_trace(tmp_path / "session.trace", events, emotion="(・・ )", exact_mode=True, max_input_length=123)
+
+    header, read_events = read_trace(str(tmp_path / "session.trace"))
+    assert header == {"exact_mode": True, "max_input_length": 123, "emotion": "(・・ )"}
+    assert read_events == [(key, None) for key in KEYS] + \
+        [("paste", "12.5×3-"), ("recall", "42"), ("check", display_checksum(display))]
+
+
+def test_event_cut_off_at_end_is_dropped(tmp_path):
+    path = tmp_path / "session.trace"
+    write_trace(path, [("1", None), ("+", None), ("paste", "23")])
+    with open(path, "r+b") as file:
+        file.truncate(os.path.getsize(path) - 1)
+    assert read_trace(str(path))[1] == [("1", None), ("+", None)]
+
+
+def test_invalid_files_are_rejected(tmp_path):
+    path = tmp_path / "session.trace"
+    path.write_bytes(b"not a trace")
+    with pytest.raises(TraceFormatError):
+        read_trace(str(path))
+    write_trace(path, [("1", None)])
+    with open(path, "ab") as file:
+        file.write(b"\x90")
+    with pytest.raises(TraceFormatError):
+        read_trace(str(path))
+
+
+def record_session(path):
+    calculator = main.Calculator(record_path=str(path))
+    bindings = calculator.window.bindings
+    for key in "12+3*4":
+        bindings[key](None)
+    bindings["<Return>"](None)
+    calculator.window.run_pending()
+    calculator.square()
+    calculator.window.run_pending()
+    calculator.window.clipboard = "7×6-"
+    bindings["<Control-v>"](None)
+    bindings["2"](None)
+    bindings["<Return>"](None)
+    calculator.window.run_pending()
+    calculator.sqrt()
+    calculator.window.run_pending()
+    calculator.run()
+    return calculator.engine.display
+
+
+def test_recorded_session_replays_identically(tmp_path):
+    path = tmp_path / "session.trace"
+    display = record_session(path)
+    events = read_trace(str(path))[1]
+    assert events[-1] == ("check", display_checksum(display))
+
+    results = run_replay([str(path)], processes=1, track_memory=True)
+    assert results["divergences"] == []
+    assert results["events"] == sum(event != "check" for event, _ in events)
+    assert len(results["memory"]) == 1 and len(results["memory"][0]["samples"]) == 2
+
+
+def test_replay_reports_diverging_checkpoint(tmp_path):
+    path = tmp_path / "session.trace"
+    record_session(path)
+    data = bytearray(path.read_bytes())
+    data[-1] ^= 0xFF
+    path.write_bytes(bytes(data))
+
+    results = run_replay([str(path)], processes=1)
+    assert len(results["divergences"]) == 1
+    assert results["memory"] == []
@@ -0,0 +1,105 @@
+import asyncio
+import json
+import socket
+import pytest
+from evaluator import ERROR_MESSAGE
+from server import EvaluationServer
+
+
+async def exchange(path, requests):
+    """
+    Sends request lines on one connection and returns the decoded responses.
+    """
+    reader, writer = await asyncio.open_unix_connection(path)
+    writer.write("".join(request + "\n" for request in requests).encode("utf-8"))
+    await writer.drain()
+    responses = [json.loads(await reader.readline()) for _ in requests]
+    writer.close()
+    await writer.wait_closed()
+    return responses
+
+
+async def serving(path, *clients):
+    """
+    Runs an EvaluationServer on path while the client coroutines run,
+    and returns their results.
+    """
+    task = asyncio.create_task(EvaluationServer(max_batch=4, max_pending=8).serve(path))
+    while True:
+        await asyncio.sleep(0.01)
+        try:
+            _, writer = await asyncio.open_unix_connection(path)
+        except OSError:
+            continue
+        writer.close()
+        break
+    try:
+        return await asyncio.gather(*clients)
+    finally:
+        task.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await task
+
+
+def request(request_id, expression, op="evaluate"):
+    return json.dumps({"id": request_id, "op": op, "expression": expression})
+
+
+@pytest.fixture
+def path(tmp_path):
+    return str(tmp_path / "calculator.sock")
+
+
+def test_responses_and_errors(path):
+    requests = [
+        request(1, "12+3*4"),
+        request(2, "0.1+0.2"),
+        request(3, "1/0"),
+        request(4, "3", "square"),
+        request(5, "-4", "sqrt"),
+        request(6, "3", "cube"),
+        "not json",
+        json.dumps({"id": 8, "expression": 5}),
+        request(9, "a=5"),
+        request(10, "a"),
+    ]
+    responses = asyncio.run(serving(path, exchange(path, requests)))[0]
+    assert [response.get("result") for response in responses[:5]] == ["24", "0.3", ERROR_MESSAGE, "9.0", ERROR_MESSAGE]
+    assert responses[5] == {"id": 6, "error": "Unknown op: 'cube'"}
+    assert responses[6] == {"id": None, "error": "Invalid JSON"}
+    assert responses[7] == {"id": 8, "error": "expression must be a string"}
+    # Names assigned by one request are not seen by the next one
+    assert [response["result"] for response in responses[8:]] == [ERROR_MESSAGE, ERROR_MESSAGE]
+
+
+def test_responses_keep_request_order_per_connection(path):
+    clients = [exchange(path, [request(f"{client}-{number}", f"{number}*{client}+1") for number in range(60)])
+               for client in range(1, 4)]
+    for client, responses in enumerate(asyncio.run(serving(path, *clients)), 1):
+        assert [(response["id"], response["result"]) for response in responses] == \
+            [(f"{client}-{number}", str(number * client + 1)) for number in range(60)]
+
+
+def test_live_socket_is_not_taken_over(path):
+    async def second_server():
+        with pytest.raises(OSError):
+            await EvaluationServer().serve(path)
+        return await exchange(path, [request(1, "2+2")])
+
+    assert asyncio.run(serving(path, second_server()))[0][0]["result"] == "4"
+
+
+def test_stale_socket_is_replaced(path):
+    stale = socket.socket(socket.AF_UNIX)
+    stale.bind(path)
+    stale.close()
+    assert asyncio.run(serving(path, exchange(path, [request(1, "2+2")])))[0][0]["result"] == "4"
+
+
+def test_other_files_are_left_alone(path):
+    with open(path, "w") as file:
+        file.write("keep")
+    with pytest.raises(FileExistsError):
+        asyncio.run(EvaluationServer().serve(path))
+    with open(path) as file:
+        assert file.read() == "keep"
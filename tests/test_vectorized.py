@@ -0,0 +1,83 @@
+import io
+import random
+import pytest
+
+np = pytest.importorskip("numpy")
+
+from engine import CalculatorEngine
+from evaluator import ERROR_MESSAGE
+from vectorized import ColumnExpression, evaluate_csv, format_results, round_values
+
+
+def run(template, text, chunk_size=4):
+    texts = []
+    for results in evaluate_csv(ColumnExpression(template), io.StringIO(text), chunk_size):
+        texts.extend(format_results(results))
+    return texts
+
+
+def test_integers_are_displayed_without_fraction():
+    assert run("A*2", "A\n3\n2.5\n1e2\n-4\n") == ["6", "5.0", "200.0", "-8"]
+    assert run("square(A) + 1", "A\n3\n") == ["10"]
+    assert run("A/1", "A\n3\n") == ["3.0"]
+    assert run("sqrt(A)", "A\n9\n") == ["3.0"]
+
+
+def test_integer_arrays_are_integral():
+    results = ColumnExpression("A + 0.5 * B").evaluate({"A": np.arange(3), "B": np.array([2, 4, 6])})
+    assert format_results(results) == ["1.0", "3.0", "5.0"]
+    results = ColumnExpression("A * B").evaluate({"A": np.arange(3), "B": np.array([2, 4, 6])})
+    assert format_results(results) == ["0", "4", "12"]
+
+
+def test_large_integers_are_exact():
+    assert run("A+B", "A,B\n9007199254740993,0\n") == ["9007199254740993"]
+    assert run("A-B", f"A,B\n{2**60 + 1},0\n{2**60 + 1},1\n") == [str(2**60 + 1), str(2**60)]
+    assert run("A*B", "A,B\n123456789012,987654321098\n") == ["121932631136585886175176"]
+    assert run("square(A) - 1", "A\n" + "9" * 200 + "\n") == [str(int("9" * 200)**2 - 1)]
+    assert run("A/B", f"A,B\n{2**60},0\n") == [ERROR_MESSAGE]
+    results = ColumnExpression("A*A + 1").evaluate({"A": np.array([2**40, 3])})
+    assert format_results(results) == [str(2**80 + 1), "10"]
+
+
+def test_named_numbers_are_errors():
+    text = 'A\ninf\nnan\n-Infinity\n"NaN"\n 3\n'
+    assert run("A+1", text) == [ERROR_MESSAGE] * 4 + ["4"]
+    assert run("A+1", "A\ninf\n2\n") == [ERROR_MESSAGE, "3"]
+
+
+def test_failing_rows_are_errors():
+    text = 'A,B\n1,0\n-4,1\n"2",x\n3\n\n5,2\n'
+    assert run("A/B + sqrt(A)", text) == [ERROR_MESSAGE] * 5 + [str(round(5 / 2 + 5**0.5, 12))]
+
+
+def test_quoted_cells_spanning_lines_stay_in_one_row():
+    text = 'A,Note\n1,"a\nb"\n2,"c\n\nd"\n3,e\n'
+    for chunk_size in (1, 2, 100):
+        assert run("A*2", text, chunk_size) == ["2", "4", "6"]
+
+
+def test_large_integer_constant_is_a_value_error():
+    with pytest.raises(ValueError):
+        ColumnExpression("A * " + "9" * 400)
+
+
+def test_rounding_matches_round():
+    rng = np.random.default_rng(0)
+    values = np.concatenate([rng.uniform(-1e4, 1e4, 20000), rng.uniform(-1, 1, 20000), [1e300, 0.0, -0.0, 5e-13]])
+    assert round_values(values).tolist() == [round(value, 12) for value in values.tolist()]
+
+
+def test_results_match_calculator():
+    rng = random.Random(3)
+
+    def cell(limit):
+        return rng.choice([str(rng.randint(0, limit)), str(rng.randint(2**52, 2**64)),
+                           f"{rng.uniform(0, 100):.{rng.randint(1, 4)}f}"])
+    rows = [(cell(9999), cell(999)) for _ in range(500)]
+    text = "A,B\n" + "".join(f"{a},{b}\n" for a, b in rows)
+    engine = CalculatorEngine()
+    for template in ("A*B+A", "A/B", "A-B*3"):
+        for (a, b), shown in zip(rows, run(template, text, chunk_size=100)):
+            engine.clear()
+            assert engine.feed(template.replace("A", a).replace("B", b) + "=")[1] == shown, (template, a, b)